@@ -13,4 +13,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'football_matchmaking.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up: serves /api/matches/<id>/live/ (Server-Sent
+# Events) directly, flushes buffered match events on lifespan shutdown and
+# hands every other request to Django.
+from matchmaking.ingest import lifespan_application  # noqa: E402
+from matchmaking.live import live_feed_application  # noqa: E402
+
+application = lifespan_application(live_feed_application(django_application))
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware.
+    'matchmaking.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,10 +80,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than the default shared-cache in-memory database, which
+        # fails concurrent writers at once instead of letting them wait for
+        # the lock (see ConcurrentScorePropositionTests).
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# LocMemCache evicts least-recently-used entries once MAX_ENTRIES is reached.
+# Point RESPONSE_CACHE_ALIAS at a shared backend (e.g. Redis or Memcached)
+# when running several worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'matchmaking',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+RESPONSE_CACHE_ALIAS = 'default'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -124,3 +150,42 @@ STATIC_URL = '/static/'
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Matchmaking
+
+# Furthest the nearest-opponent search looks before settling for fewer teams.
+NEAREST_TEAMS_MAX_KM = 500.0
+
+# Elo rating engine (see matchmaking/ratings.py).
+RATING_INITIAL = 1500.0
+RATING_K_FACTOR = 32.0
+
+# Threads serving database reads for the async views (matchmaking/async_views.py).
+ASYNC_DB_WORKERS = 8
+
+# Live match event feed (matchmaking/live.py).
+LIVE_FEED_BUFFER_SIZE = 200
+LIVE_FEED_SUBSCRIBER_QUEUE = 500
+LIVE_FEED_POLL_SECONDS = 2.0
+# Each poll re-reads the events of this many poll intervals, catching late commits.
+LIVE_FEED_REPOLL_ROUNDS = 5
+LIVE_FEED_KEEPALIVE_SECONDS = 15.0
+
+# Batched match event ingestion (matchmaking/ingest.py). With write-behind on,
+# events are acknowledged with sequence numbers and written in batches.
+EVENT_WRITE_BEHIND = False
+EVENT_BUFFER_MAX_SIZE = 500
+EVENT_BUFFER_FLUSH_SECONDS = 1.0
+
+# Request instrumentation (matchmaking/metrics.py), served at /metrics.
+# Requests and single SQL statements slower than these are logged to the
+# "matchmaking.slow" logger.
+METRICS_SLOW_REQUEST_MS = 500
+METRICS_SLOW_SQL_MS = 100
+# Add a Server-Timing header (app and db time) to every response.
+METRICS_SERVER_TIMING = False
+
+# Team name autocomplete cache (matchmaking/search.py).
+TEAM_SEARCH_CACHE_SIZE = 1000
+TEAM_SEARCH_CACHE_SECONDS = 30
@@ -0,0 +1,47 @@
+"""
+SQLite production settings: WAL journaling, tuned PRAGMAs, persistent
+connections and reads routed to a read-only connection.
+
+Use with DJANGO_SETTINGS_MODULE=football_matchmaking.settings_production.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASE_PATH = BASE_DIR / 'db.sqlite3'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DATABASE_PATH,
+        # Keep each thread's connection (and its PRAGMAs and page cache) open.
+        'CONN_MAX_AGE': None,
+        # Seconds a writer waits for the write lock before "database is locked".
+        'OPTIONS': {'timeout': 20},
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+    # The same file opened read-only; see matchmaking.db.ReadReplicaRouter.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{DATABASE_PATH}?mode=ro',
+        'CONN_MAX_AGE': None,
+        'OPTIONS': {'timeout': 20},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['matchmaking.db.ReadReplicaRouter']
+
+# Applied to every new connection by matchmaking.db.apply_sqlite_pragmas.
+# journal_mode is stored in the database file, so only the writable
+# connection sets it; read-only connections cannot.
+_READ_PRAGMAS = {
+    'synchronous': 'NORMAL',   # WAL is still crash-safe; fsync only at checkpoints
+    'mmap_size': 268435456,    # 256 MiB of the file read through the page cache
+    'cache_size': -65536,      # 64 MiB per connection
+    'busy_timeout': 20000,
+    'temp_store': 'MEMORY',
+}
+SQLITE_PRAGMAS = {
+    'default': {'journal_mode': 'WAL', **_READ_PRAGMAS},
+    'replica': _READ_PRAGMAS,
+}
@@ -1,9 +1,16 @@
 from django.contrib import admin
 from .models import Match, MatchEvent, Team, TeamRequest, User, Player, PlayerInvite
 
-admin.site.register(Match)
+
+class CounterReadOnlyAdmin(admin.ModelAdmin):
+    # Counters are maintained with F() updates; a plain save() refuses to write them.
+    def get_readonly_fields(self, request, obj=None):
+        return self.model.counter_fields
+
+
+admin.site.register(Match, CounterReadOnlyAdmin)
 admin.site.register(MatchEvent)
-admin.site.register(Team)
+admin.site.register(Team, CounterReadOnlyAdmin)
 admin.site.register(TeamRequest)
 admin.site.register(User)
 admin.site.register(Player)
@@ -0,0 +1,110 @@
+"""Async variants of the hot read endpoints, for serving under ASGI.
+
+Django's ORM is synchronous here, so every database read is handed to a
+bounded thread pool (``ASYNC_DB_WORKERS`` threads) instead of running on the
+event loop. A slow SQLite read then ties up one pool thread rather than the
+whole worker, and the event loop keeps accepting and answering clients.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .leaderboard import leaderboard
+from .models import Team
+from .serializers import TeamSerializer
+from .params import bounded_int
+from .views import filter_teams, match_detail_state, request_etags, team_detail_state
+
+executor = ThreadPoolExecutor(max_workers=getattr(settings, 'ASYNC_DB_WORKERS', 8), thread_name_prefix='matchmaking-db')
+
+
+def _in_worker(fn, *args):
+    # Pool threads keep their own connections; honour CONN_MAX_AGE like a request would.
+    close_old_connections()
+    try:
+        return fn(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_db(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, partial(_in_worker, fn, *args))
+
+
+def get_only(view):
+    # ``require_GET`` wraps views in a sync function, which would hide the coroutine from Django 3.2.
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        return await view(request, *args, **kwargs)
+    return inner
+
+
+def _json(data, status=200, **headers):
+    response = JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+async def _detail(request, state, id, not_found):
+    code, payload, etag = await run_db(state, request_etags(request), id)
+    if code == 404:
+        return _json({"detail": not_found}, status=404)
+    if code == 304:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+    return _json(payload, ETag=etag)
+
+
+# Chi tiết đội bóng (async)
+@get_only
+async def team_detail(request, id):
+    return await _detail(request, team_detail_state, id, "Team not found.")
+
+
+# Chi tiết trận đấu (async)
+@get_only
+async def match_detail(request, id):
+    return await _detail(request, match_detail_state, id, "Match not found.")
+
+
+def _team_page(params, after, limit):
+    teams = filter_teams(Team.objects.with_players(), params).filter(id__gt=after).order_by('id')
+    page = list(teams[:limit + 1])
+    next_after = page[limit - 1].id if len(page) > limit else None
+    return {"next_after": next_after, "results": TeamSerializer(page[:limit], many=True).data}
+
+
+# Danh sách đội bóng (async, phân trang theo id)
+@get_only
+async def team_list(request):
+    try:
+        after = int(request.GET.get('after', 0))
+        limit = bounded_int(request.GET, 'limit', 50, 200)
+        # Validate filters before handing the query to a pool thread.
+        filter_teams(Team.objects.none(), request.GET)
+    except ValueError as exc:
+        return _json({"detail": str(exc)}, status=400)
+    return _json(await run_db(_team_page, request.GET, after, limit))
+
+
+def _leaderboard_page(limit):
+    return {"total": leaderboard.count(), "results": leaderboard.top(limit)}
+
+
+# Bảng xếp hạng (async)
+@get_only
+async def leaderboard_top(request):
+    try:
+        limit = bounded_int(request.GET, 'limit', 10, 100)
+    except ValueError as exc:
+        return _json({"detail": str(exc)}, status=400)
+    return _json(await run_db(_leaderboard_page, limit))
@@ -0,0 +1,352 @@
+"""Endpoint benchmarks: seed a database, then time every route in ``matchmaking.urls``.
+
+Each route has one or more ``Route`` entries: the HTTP method, how to build
+the request for the i-th iteration and the most SQL queries one request may
+issue. ``build`` runs outside the timed section, so it can create whatever a
+write endpoint consumes (an invite to accept, a ticket to cancel, ...).
+"""
+import math
+import multiprocessing
+import random
+import statistics
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import date, timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connections
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from rest_framework.test import APIClient
+
+from . import cache, headtohead
+from .bulk import bulk_create_with_ids
+from .models import Match, MatchEvent, Player, PlayerInvite, QueueTicket, Team, TeamRequest, User
+from .urls import urlpatterns
+
+
+@contextmanager
+def scratch_database():
+    """Run the block against freshly created test databases (test mirrors included)."""
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+class Fixture:
+    """Ids of the seeded rows, handed to every request builder."""
+
+    def __init__(self, team_ids, player_ids, free_player_ids, match_ids):
+        self.team_ids = team_ids
+        self.player_ids = player_ids
+        self.free_player_ids = free_player_ids
+        self.match_ids = match_ids
+
+    def team(self, i):
+        return self.team_ids[i % len(self.team_ids)]
+
+    def other_team(self, i):
+        return self.team_ids[(i + 1) % len(self.team_ids)]
+
+    def player(self, i):
+        return self.player_ids[i % len(self.player_ids)]
+
+    def match(self, i):
+        return self.match_ids[i % len(self.match_ids)]
+
+
+def seed(teams=200, players=2000, matches=5000, events=10000, seed=0, batch_size=1000):
+    """Fill the database with a random league and return its ``Fixture``."""
+    rng = random.Random(seed)
+    today = date.today()
+
+    team_objs = bulk_create_with_ids(Team, [
+        Team(name=f"Team {i}", is_public=rng.random() < 0.9, score=rng.randint(0, 300),
+             rating=rng.gauss(1500, 150), latitude=rng.uniform(20.9, 21.1), longitude=rng.uniform(105.7, 105.9))
+        for i in range(teams)
+    ], batch_size=batch_size)
+    team_ids = [team.pk for team in team_objs]
+
+    users = bulk_create_with_ids(User, [
+        User(name=f"Player{i}", surname="Bench", mail=f"player{i}@example.com") for i in range(players)
+    ], batch_size=batch_size)
+    # One player in ten is a free agent.
+    player_objs = bulk_create_with_ids(Player, [
+        Player(user_id=user.pk, team_id=None if n % 10 == 0 else rng.choice(team_ids)) for n, user in enumerate(users)
+    ], batch_size=batch_size)
+
+    match_objs = []
+    for _ in range(matches):
+        inviting, guest = rng.sample(team_ids, 2)
+        played = rng.random() < 0.7
+        match_objs.append(Match(
+            inviting_team_id=inviting, guest_team_id=guest,
+            status='COMPLETED' if played else 'PENDING',
+            created_at=today - timedelta(days=rng.randint(0, 365)),
+            expires_at=None if played else today + timedelta(days=rng.randint(1, 30)),
+            inviting_score=rng.randint(0, 5) if played else None,
+            guest_score=rng.randint(0, 5) if played else None,
+        ))
+    match_ids = [match.pk for match in bulk_create_with_ids(Match, match_objs, batch_size=batch_size)]
+
+    MatchEvent.objects.bulk_create([
+        MatchEvent(match_id=rng.choice(match_ids), event_type=rng.choice(('Goal', 'Penalty', 'Card', 'Substitution')))
+        for _ in range(events)
+    ], batch_size=batch_size)
+
+    headtohead.rebuild(batch_size=batch_size)
+    cache.clear()
+    return Fixture(
+        team_ids,
+        [player.pk for player in player_objs],
+        [player.pk for player in player_objs if player.team_id is None],
+        match_ids,
+    )
+
+
+class Route:
+    def __init__(self, pattern, method, budget, build, fmt='json', counts_queries=True):
+        self.pattern = pattern
+        self.method = method
+        # Most SQL queries one request may issue; None means no budget.
+        self.budget = budget
+        self.build = build
+        self.fmt = fmt
+        # Async views query from pool threads, out of reach of CaptureQueriesContext.
+        self.counts_queries = counts_queries
+
+
+def _invite(fixture, i):
+    invite = PlayerInvite.objects.create(team_id=fixture.team(i), player_id=fixture.player(i))
+    return f'/api/player_invitations/{invite.pk}/accept/', None
+
+
+def _team_request(fixture, i):
+    team_request = TeamRequest.objects.create(team_id=fixture.team(i), player_id=fixture.player(i), status='PENDING')
+    return f'/api/team_requests/{team_request.pk}/accept/', None
+
+
+def _queue_post(fixture, i):
+    QueueTicket.objects.filter(team_id=fixture.team(i), status='WAITING').update(status='CANCELLED')
+    return f'/api/teams/{fixture.team(i)}/queue/', None
+
+
+def _queued(fixture, i):
+    QueueTicket.objects.filter(team_id=fixture.team(i), status='WAITING').update(status='CANCELLED')
+    QueueTicket.objects.create(team_id=fixture.team(i))
+    return f'/api/teams/{fixture.team(i)}/queue/', None
+
+
+def _proposition(fixture, i):
+    match = Match.objects.only('inviting_team_id', 'guest_team_id').get(pk=fixture.match(i // 2))
+    team_id = match.inviting_team_id if i % 2 == 0 else match.guest_team_id
+    return f'/api/matches/{match.pk}/score-proposition/', {'my_team_id': team_id, 'my_score': 1, 'opponent_score': 1}
+
+
+def _import_file(fixture, i):
+    rows = ''.join(f"Imported{i}_{n},Bench,imported{i}_{n}@example.com,{fixture.team(n)}\n" for n in range(50))
+    upload = SimpleUploadedFile(f'players{i}.csv', f"name,surname,mail,team\n{rows}".encode(), content_type='text/csv')
+    return '/api/players/import/', {'file': upload}
+
+
+def _bulk_matches(fixture, i):
+    return '/api/matches/bulk/', {'matches': [
+        {'inviting_team': fixture.team(i + n), 'guest_team': fixture.other_team(i + n)} for n in range(100)
+    ]}
+
+
+def _bulk_events(fixture, i):
+    return '/api/matches/events/bulk/', {'events': [
+        {'match': fixture.match(i + n), 'event_type': 'Goal'} for n in range(100)
+    ]}
+
+
+def _user(i):
+    return {'name': f"Bench{i}", 'surname': "User", 'mail': f"bench{i}@example.com"}
+
+
+ROUTES = [
+    Route('api/teams/<int:id>/', 'get', 4, lambda f, i: (f'/api/teams/{f.team(i)}/', None)),
+    Route('api/teams/', 'get', 2, lambda f, i: ('/api/teams/?limit=50', None)),
+    Route('api/teams/<int:id>/challenge/', 'post', 3, lambda f, i: (
+        f'/api/teams/{f.team(i)}/challenge/', {'guest_team_id': f.other_team(i), 'created_at': str(date.today())})),
+    Route('api/teams/<int:id>/opponents/', 'get', 5, lambda f, i: (f'/api/teams/{f.team(i)}/opponents/', None)),
+    Route('api/teams/<int:id>/queue/', 'get', 1, _queued),
+    Route('api/teams/<int:id>/queue/', 'post', 4, _queue_post),
+    Route('api/teams/<int:id>/queue/', 'delete', 1, _queued),
+    Route('api/teams/<int:id>/matches/', 'get', 2, lambda f, i: (f'/api/teams/{f.team(i)}/matches/?limit=50', None)),
+    # Team lookup plus one query per doubling of the search radius.
+    Route('api/teams/<int:id>/nearest/', 'get', 4, lambda f, i: (f'/api/teams/{f.team(i)}/nearest/', None)),
+    Route('api/teams/nearby/', 'get', 1, lambda f, i: ('/api/teams/nearby/?lat=21.0&lon=105.8&km=5', None)),
+    Route('api/players/free-agents/', 'get', 1,
+          lambda f, i: ('/api/players/free-agents/' + ('?q=player1' if i % 2 else ''), None)),
+    Route('api/teams/search/', 'get', 1, lambda f, i: (f'/api/teams/search/?q=team {i}', None)),
+    # Repeated prefixes are answered from the autocomplete cache.
+    Route('api/teams/autocomplete/', 'get', 1, lambda f, i: (f'/api/teams/autocomplete/?q=team {i % 10}', None)),
+    Route('api/matches/<int:id>/', 'get', 3, lambda f, i: (f'/api/matches/{f.match(i)}/', None)),
+    Route('api/matches/<int:match_id>/score-proposition/', 'post', 7, _proposition),
+    Route('api/create_player/', 'post', 2, lambda f, i: ('/api/create_player/', _user(i))),
+    Route('api/players/import/', 'post', 9, _import_file, fmt='multipart'),
+    Route('api/create_team/', 'post', 2, lambda f, i: (
+        '/api/create_team/', {'name': f"Bench team {i}", 'is_public': True, 'latitude': 21.0, 'longitude': 105.8})),
+    Route('api/teams/<int:team_id>/invite_player/', 'post', 3, lambda f, i: (
+        f'/api/teams/{f.team(i)}/invite_player/', {'player_id': f.free_player_ids[i % len(f.free_player_ids)]})),
+    Route('api/teams/<int:team_id>/request_join/', 'post', 3, lambda f, i: (
+        f'/api/teams/{f.team(i)}/request_join/', {'player_id': f.player(i), 'message': "Let me play"})),
+    Route('api/player_invitations/<int:invite_id>/accept/', 'post', 7, _invite),
+    Route('api/team_requests/<int:request_id>/accept/', 'post', 7, _team_request),
+    Route('api/matches/create/', 'post', 1, lambda f, i: ('/api/matches/create/', {
+        'inviting_team': f.team(i), 'guest_team': f.other_team(i), 'created_at': str(date.today()), 'expires_at': None})),
+    Route('api/matches/bulk/', 'post', 6, _bulk_matches),
+    Route('api/matches/events/bulk/', 'post', 7, _bulk_events),
+    Route('api/leaderboard/', 'get', 2, lambda f, i: ('/api/leaderboard/?limit=10', None)),
+    Route('api/teams/<int:id>/head-to-head/<int:opponent_id>/', 'get', 2,
+          lambda f, i: (f'/api/teams/{f.team(i)}/head-to-head/{f.team(i + 1)}/', None)),
+    Route('api/teams/<int:id>/rank/', 'get', 5, lambda f, i: (f'/api/teams/{f.team(i)}/rank/', None)),
+    Route('api/export/<slug:dataset>.<slug:fmt>', 'get', 1, lambda f, i: ('/api/export/matches.ndjson', None)),
+    Route('api/cache/stats/', 'get', 0, lambda f, i: ('/api/cache/stats/', None)),
+    Route('metrics', 'get', 0, lambda f, i: ('/metrics', None)),
+    Route('api/async/teams/', 'get', None, lambda f, i: ('/api/async/teams/?limit=50', None), counts_queries=False),
+    Route('api/async/teams/<int:id>/', 'get', None, lambda f, i: (f'/api/async/teams/{f.team(i)}/', None),
+          counts_queries=False),
+    Route('api/async/matches/<int:id>/', 'get', None, lambda f, i: (f'/api/async/matches/{f.match(i)}/', None),
+          counts_queries=False),
+    Route('api/async/leaderboard/', 'get', None, lambda f, i: ('/api/async/leaderboard/', None), counts_queries=False),
+]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def _request(client, route, path, data):
+    response = getattr(client, route.method)(path, data, format=route.fmt)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(route, fixture, iterations=50, warmup=3):
+    """Time ``iterations`` requests to ``route`` and return a result dict."""
+    client = APIClient()
+    client.raise_request_exception = False
+    latencies, queries, statuses = [], [], set()
+    for i in range(warmup + iterations):
+        path, data = route.build(fixture, i)
+        # Every alias, so reads routed to a replica are counted too.
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+            started = time.perf_counter()
+            response = _request(client, route, path, data)
+            elapsed = time.perf_counter() - started
+        if i >= warmup:
+            latencies.append(elapsed)
+            queries.append(sum(len(context) for context in captured))
+            statuses.add(response.status_code)
+    return {
+        'route': route.pattern,
+        'method': route.method.upper(),
+        'iterations': iterations,
+        'p50_ms': round(_percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'queries': max(queries) if route.counts_queries else None,
+        'budget': route.budget,
+        'statuses': sorted(statuses),
+    }
+
+
+def uncovered_routes():
+    """URL patterns of ``matchmaking.urls`` that have no ``Route``."""
+    covered = {route.pattern for route in ROUTES}
+    return [str(pattern.pattern) for pattern in urlpatterns if str(pattern.pattern) not in covered]
+
+
+def run(fixture, iterations=50, warmup=3, only=None):
+    return [measure(route, fixture, iterations, warmup) for route in ROUTES if only is None or only in route.pattern]
+
+
+def over_budget(results):
+    return [result for result in results
+            if result['budget'] is not None and result['queries'] is not None and result['queries'] > result['budget']]
+
+
+def _write_work(fixture, worker):
+    def work(i):
+        match_id = fixture.match(worker * 7919 + i // 2)
+        match = Match.objects.only('inviting_team_id', 'guest_team_id').get(pk=match_id)
+        team_id = match.inviting_team_id if i % 2 == 0 else match.guest_team_id
+        Match.propose_score(match_id, team_id, i % 3, 1)
+    return work
+
+
+def _read_work(fixture, worker):
+    client = APIClient()
+    client.raise_request_exception = False
+
+    def work(i):
+        response = client.get(f'/api/teams/{fixture.team(worker * 31 + i)}/matches/?limit=50')
+        if response.status_code >= 500:
+            raise OperationalError(f"status {response.status_code}")
+    return work
+
+
+def _contention_worker(kind, build, fixture, worker, deadline, results):
+    latencies, errors = [], 0
+    work = build(fixture, worker)
+    i = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            work(i)
+        except OperationalError:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+        i += 1
+    connections.close_all()
+    results.put((kind, latencies, errors))
+
+
+def contention(fixture, seconds=10.0, writers=4, readers=8):
+    """Run concurrent score propositions and match-history reads for ``seconds``.
+
+    Every worker is a separate process with its own connections, as under a
+    multi-process server, so the numbers measure database locking rather
+    than the GIL. Returns throughput, p50/p99 latency and the number of
+    errors (e.g. "database is locked") per kind of operation.
+    """
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    # Children must not inherit open connections.
+    connections.close_all()
+    deadline = time.perf_counter() + seconds
+    processes = [context.Process(target=_contention_worker, args=(kind, build, fixture, n, deadline, results))
+                 for kind, build, count in (('writes', _write_work, writers), ('reads', _read_work, readers))
+                 for n in range(count)]
+    for process in processes:
+        process.start()
+    collected = {'writes': ([], []), 'reads': ([], [])}
+    for _ in processes:
+        kind, latencies, errors = results.get()
+        collected[kind][0].extend(latencies)
+        collected[kind][1].append(errors)
+    for process in processes:
+        process.join()
+
+    summary = {}
+    for kind, (latencies, errors) in collected.items():
+        summary[kind] = {
+            'ops': len(latencies),
+            'per_second': round(len(latencies) / seconds, 1),
+            'p50_ms': round(_percentile(latencies, 0.5) * 1000, 3) if latencies else None,
+            'p99_ms': round(_percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+            'errors': sum(errors),
+        }
+    return summary
@@ -0,0 +1,24 @@
+from django.db import connection, transaction
+from django.db.models import Max
+
+
+def bulk_create_with_ids(model, objs, batch_size=1000):
+    """``bulk_create`` that always leaves ``pk`` set on the created objects.
+
+    Backends that cannot return ids from a bulk insert (SQLite before Django
+    4.0) get them from the id range the insert produced. The ``MAX(id)`` read
+    and the insert share one transaction, and SQLite allows a single writer, so
+    a concurrent insert makes this one fail instead of landing in the range.
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            return model.objects.bulk_create(objs, batch_size=batch_size)
+        last_id = model.objects.aggregate(last=Max('id'))['last'] or 0
+        model.objects.bulk_create(objs, batch_size=batch_size)
+        ids = model.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)
+        for obj, pk in zip(objs, ids):
+            obj.pk = pk
+    return objs
@@ -0,0 +1,72 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+stats = CacheStats()
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def team_key(team_id):
+    return f'matchmaking:team:{team_id}'
+
+
+def match_key(match_id):
+    return f'matchmaking:match:{match_id}'
+
+
+def lookup(key):
+    payload = _cache().get(key)
+    stats.record(payload is not None)
+    return payload
+
+
+def store(key, payload):
+    _cache().set(key, payload)
+
+
+def discard(key):
+    _cache().delete(key)
+
+
+def _invalidate(keys):
+    # Deleted once the current transaction commits (at once outside of one):
+    # deleting earlier lets a concurrent reader cache the old row again, and
+    # a rollback would leave nothing to invalidate.
+    if keys:
+        transaction.on_commit(lambda: _cache().delete_many(keys))
+
+
+def invalidate_teams(team_ids):
+    _invalidate([team_key(team_id) for team_id in team_ids if team_id is not None])
+
+
+def invalidate_matches(match_ids):
+    _invalidate([match_key(match_id) for match_id in match_ids if match_id is not None])
+
+
+def clear():
+    _cache().clear()
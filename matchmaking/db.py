@@ -0,0 +1,75 @@
+"""SQLite production mode: per-connection PRAGMAs and read/write routing.
+
+Both are switched on by ``football_matchmaking/settings_production.py``;
+with the default settings neither does anything.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Run ``SQLITE_PRAGMAS[alias]`` on every new SQLite connection of that alias."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {}).get(connection.alias, {})
+    if pragmas:
+        with connection.cursor() as cursor:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def write_transaction(using=DEFAULT_DB_ALIAS):
+    """``transaction.atomic()`` holding the database write lock from its start.
+
+    Read-then-write transactions lock their rows with ``select_for_update()``,
+    which SQLite ignores: there two such transactions both read, then
+    deadlock when both try to write. On SQLite the outermost block therefore
+    begins with ``BEGIN IMMEDIATE``, which waits for the write lock (up to
+    the connection timeout) before anything is read. A nested block runs in
+    the enclosing transaction and its locking.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    # ``atomic`` starts SQLite transactions through this hook; shadow it for this block.
+    connection._start_transaction_under_autocommit = lambda: connection.cursor().execute('BEGIN IMMEDIATE')
+    try:
+        with transaction.atomic(using=using):
+            del connection._start_transaction_under_autocommit
+            yield
+    finally:
+        connection.__dict__.pop('_start_transaction_under_autocommit', None)
+
+
+class ReadReplicaRouter:
+    """Send ``matchmaking`` reads to the read-only ``replica`` alias.
+
+    ``replica`` opens the same SQLite file read-only, so under WAL its
+    readers never wait for the writer and always see committed data. Reads
+    made while the primary is inside a transaction stay on the primary, so a
+    request sees its own uncommitted writes; ``select_for_update()`` counts
+    as a write and always goes to the primary.
+    """
+    replica = 'replica'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'matchmaking' or connections['default'].in_atomic_block:
+            return 'default'
+        return self.replica
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
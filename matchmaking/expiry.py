@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache
+from .models import Match, PlayerInvite, TeamRequest
+
+
+def _overdue(today):
+    # name -> (overdue rows, how to retire a batch of them)
+    return {
+        'player_invites': (
+            PlayerInvite.objects.filter(expire_date__lt=today),
+            lambda rows: rows.delete()[0],
+        ),
+        'team_requests': (
+            TeamRequest.objects.filter(status='PENDING', expire_date__lt=today),
+            lambda rows: rows.update(status='EXPIRED'),
+        ),
+        'matches': (
+            Match.objects.filter(status='PENDING', expires_at__lt=today, inviting_score__isnull=True),
+            _expire_matches,
+        ),
+    }
+
+
+def _expire_matches(rows):
+    count = rows.touch(status='EXPIRED')
+    cache.invalidate_matches(rows.values_list('id', flat=True))
+    return count
+
+
+def sweep(batch_size=500, today=None):
+    """Expire or delete every overdue invite, team request and pending match.
+
+    Rows are handled ``batch_size`` at a time, each batch in its own short
+    transaction, so the SQLite write lock is never held for long. Returns the
+    number of rows processed per kind.
+    """
+    today = today or timezone.now().date()
+    processed = {}
+    for name, (overdue, retire) in _overdue(today).items():
+        processed[name] = 0
+        while True:
+            with transaction.atomic():
+                ids = list(overdue.order_by('id').values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                processed[name] += retire(overdue.model.objects.filter(id__in=ids))
+            if len(ids) < batch_size:
+                break
+    return processed
@@ -0,0 +1,79 @@
+import csv
+import json
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Match, MatchEvent, ScoreProposition
+
+CHUNK_SIZE = 2000
+
+# dataset name -> (model, exported columns, column the ``since`` filter applies to)
+DATASETS = {
+    'matches': (
+        Match,
+        ['id', 'status', 'created_at', 'expires_at', 'suggested_at', 'inviting_team_id', 'guest_team_id',
+         'inviting_score', 'guest_score', 'host_proposition_id', 'guest_proposition_id', 'updated_at'],
+        # Scores are agreed long after a match is created.
+        'updated_at',
+    ),
+    'propositions': (
+        ScoreProposition,
+        ['id', 'inviting_score', 'guest_score', 'suggesting_team_id', 'note', 'created_at', 'updated_at'],
+        'updated_at',
+    ),
+    'events': (
+        MatchEvent,
+        ['id', 'match_id', 'timestamp', 'event_type', 'description'],
+        'timestamp',
+    ),
+}
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def parse_since(value):
+    """Parse a ``since`` date or datetime into an aware datetime; raises ValueError."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def iter_records(dataset, since=None):
+    """Stream one dataset as dicts in id order, ``CHUNK_SIZE`` rows per database fetch."""
+    model, fields, since_field = DATASETS[dataset]
+    queryset = model.objects.order_by('id')
+    if since is not None:
+        queryset = queryset.filter(**{f'{since_field}__gte': since})
+    return queryset.values(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to ``csv.writer``'s caller."""
+
+    def write(self, value):
+        return value
+
+
+def render(dataset, fmt, records):
+    """Yield the encoded lines of ``records`` in ``fmt``, one row at a time."""
+    if fmt == 'ndjson':
+        for record in records:
+            yield json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+    elif fmt == 'csv':
+        fields = DATASETS[dataset][1]
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        for record in records:
+            yield writer.writerow([record[field] for field in fields])
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
@@ -0,0 +1,73 @@
+import math
+
+from django.conf import settings
+
+from .models import Team
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, km):
+    """``(min_lat, max_lat, min_lon, max_lon)`` enclosing the circle; longitude is None near the poles or the antimeridian."""
+    delta_lat = km / KM_PER_DEGREE
+    min_lat, max_lat = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat <= 1e-9:
+        return min_lat, max_lat, None, None
+    delta_lon = delta_lat / cos_lat
+    if longitude - delta_lon < -180.0 or longitude + delta_lon > 180.0:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, longitude - delta_lon, longitude + delta_lon
+
+
+def teams_within(latitude, longitude, km, queryset=None):
+    """Teams within ``km`` of a point, nearest first, as ``(team, distance_km)``.
+
+    The bounding box is answered by the (latitude, longitude) index; only the
+    teams inside it get an exact great-circle distance.
+    """
+    queryset = Team.objects.filter(is_public=True) if queryset is None else queryset
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, km)
+    candidates = queryset.filter(latitude__range=(min_lat, max_lat), longitude__isnull=False)
+    if min_lon is not None:
+        candidates = candidates.filter(longitude__range=(min_lon, max_lon))
+
+    results = []
+    for team in candidates:
+        distance = haversine_km(latitude, longitude, team.latitude, team.longitude)
+        if distance <= km:
+            results.append((team, distance))
+    results.sort(key=lambda item: (item[1], item[0].id))
+    return results
+
+
+def nearest_teams(latitude, longitude, k, queryset=None, start_km=5.0, max_km=None):
+    """The ``k`` nearest teams within ``max_km``, found by doubling the search radius until enough turn up.
+
+    Returns ``(results, km)``, ``km`` being the radius actually searched. The
+    search never goes beyond ``max_km`` (``NEAREST_TEAMS_MAX_KM`` by default),
+    so a sparse area gets fewer than ``k`` teams rather than a bounding box
+    around the whole globe. If fewer than ``k`` teams have a location at all,
+    it stops as soon as it has found every one of them.
+    """
+    queryset = Team.objects.filter(is_public=True) if queryset is None else queryset
+    max_km = getattr(settings, 'NEAREST_TEAMS_MAX_KM', 500.0) if max_km is None else max_km
+    located = None
+    km = min(start_km, max_km)
+    while True:
+        results = teams_within(latitude, longitude, km, queryset)
+        if len(results) >= k or km >= max_km:
+            return results[:k], km
+        if located is None:
+            located = queryset.filter(latitude__isnull=False, longitude__isnull=False).count()
+        if len(results) >= located:
+            return results, km
+        km = min(km * 2, max_km)
@@ -0,0 +1,119 @@
+"""Head-to-head records between pairs of teams.
+
+Every pair that has played an agreed match has one ``HeadToHead`` row,
+keyed by ``(team_low, team_high)`` with the lower team id first, so a
+record is a single-row lookup instead of a scan of both teams' histories.
+``record_result`` applies one newly agreed (or corrected) score;
+``rebuild`` recomputes the whole table from the match history, e.g. after
+matches were deleted or imported in bulk.
+"""
+import numpy as np
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+
+
+def _totals(inviting_is_low, inviting_score, guest_score):
+    """Column increments of one match result."""
+    low, high = (inviting_score, guest_score) if inviting_is_low else (guest_score, inviting_score)
+    return {'matches': 1, 'low_wins': int(low > high), 'draws': int(low == high), 'high_wins': int(low < high),
+            'low_goals': low, 'high_goals': high}
+
+
+def record_result(match, old_inviting_score=None, old_guest_score=None):
+    """Add ``match``'s agreed score to its pair's record, replacing the old score if it had one.
+
+    Two queries whatever the state of the pair: an INSERT that is ignored if
+    the row already exists, then one UPDATE of the running totals.
+    """
+    from .models import HeadToHead
+
+    low, high = sorted((match.inviting_team_id, match.guest_team_id))
+    inviting_is_low = match.inviting_team_id == low
+    delta = _totals(inviting_is_low, match.inviting_score, match.guest_score)
+    if old_inviting_score is not None:
+        for column, value in _totals(inviting_is_low, old_inviting_score, old_guest_score).items():
+            delta[column] -= value
+
+    # The last meeting is the latest by (date, id); a correction keeps it.
+    is_later = (Q(last_played__isnull=True) | Q(last_played__lt=match.created_at) |
+                Q(last_played=match.created_at, last_match_id__lte=match.pk))
+    HeadToHead.objects.bulk_create([HeadToHead(team_low_id=low, team_high_id=high)], ignore_conflicts=True)
+    HeadToHead.objects.filter(team_low_id=low, team_high_id=high).update(
+        last_match_id=Case(When(is_later, then=Value(match.pk)), default=F('last_match_id'),
+                           output_field=models.IntegerField()),
+        last_played=Case(When(is_later, then=Value(match.created_at)), default=F('last_played'),
+                         output_field=models.DateField()),
+        **{column: F(column) + value for column, value in delta.items() if value},
+    )
+
+
+def rebuild(batch_size=1000):
+    """Recompute every head-to-head record from the agreed match history."""
+    from .models import HeadToHead, Match
+
+    rows = (Match.objects
+            .filter(inviting_score__isnull=False, guest_score__isnull=False,
+                    inviting_team__isnull=False, guest_team__isnull=False)
+            .exclude(inviting_team=F('guest_team'))
+            .values_list('inviting_team_id', 'guest_team_id', 'inviting_score', 'guest_score', 'created_at', 'id'))
+    history = list(rows.iterator(chunk_size=10000))
+
+    records = []
+    if history:
+        columns = list(zip(*history))
+        inviting, guest, inviting_score, guest_score = (np.array(column, dtype=np.int64) for column in columns[:4])
+        played = np.array(columns[4], dtype='datetime64[D]')
+        ids = np.array(columns[5], dtype=np.int64)
+
+        swap = inviting > guest
+        low, high = np.where(swap, guest, inviting), np.where(swap, inviting, guest)
+        low_goals = np.where(swap, guest_score, inviting_score)
+        high_goals = np.where(swap, inviting_score, guest_score)
+        pairs, pair = np.unique(np.stack([low, high], axis=1), axis=0, return_inverse=True)
+        pair = pair.reshape(-1)
+
+        def total(values):
+            return np.bincount(pair, weights=values, minlength=len(pairs)).astype(np.int64).tolist()
+
+        # Sorted by pair, then date and id: the last row of each pair is its last meeting.
+        order = np.lexsort((ids, played, pair))
+        last = order[np.append(np.flatnonzero(np.diff(pair[order])), len(order) - 1)]
+
+        outcome = np.sign(low_goals - high_goals)
+        records = [
+            HeadToHead(team_low_id=a, team_high_id=b, matches=n, low_wins=w, draws=d, high_wins=l,
+                       low_goals=gf, high_goals=ga, last_match_id=m, last_played=p)
+            for a, b, n, w, d, l, gf, ga, m, p in zip(
+                pairs[:, 0].tolist(), pairs[:, 1].tolist(), total(None), total(outcome > 0), total(outcome == 0),
+                total(outcome < 0), total(low_goals), total(high_goals), ids[last].tolist(), played[last].tolist())
+        ]
+
+    with transaction.atomic():
+        HeadToHead.objects.all().delete()
+        HeadToHead.objects.bulk_create(records, batch_size=batch_size)
+    return len(history), len(records)
+
+
+def between(team_id, opponent_id):
+    """``team_id``'s record against ``opponent_id``, or None if either team does not exist."""
+    from .models import HeadToHead, Team
+
+    low, high = sorted((team_id, opponent_id))
+    record = HeadToHead.objects.select_related('last_match').filter(team_low_id=low, team_high_id=high).first()
+    if record is None:
+        if Team.objects.filter(pk__in=[team_id, opponent_id]).count() < 2:
+            return None
+        record = HeadToHead(team_low_id=low, team_high_id=high)
+
+    is_low = team_id == low
+    return {
+        'team': team_id,
+        'opponent': opponent_id,
+        'matches': record.matches,
+        'wins': record.low_wins if is_low else record.high_wins,
+        'draws': record.draws,
+        'losses': record.high_wins if is_low else record.low_wins,
+        'goals_for': record.low_goals if is_low else record.high_goals,
+        'goals_against': record.high_goals if is_low else record.low_goals,
+        'last_match': record.last_match,
+    }
@@ -0,0 +1,90 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from . import cache
+from .bulk import bulk_create_with_ids
+from .models import Player, Team, User
+
+MAX_REPORTED_ERRORS = 100
+
+
+def iter_rows(lines, fmt):
+    """Lazily parse an iterable of text lines as CSV (with a header) or JSONL.
+
+    Yields ``(line, row)`` pairs, where ``line`` is the 1-based line of the
+    file the row ends on, so that reported errors point at the file.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if line:
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    # Reported as an invalid row by ``import_players``.
+                    yield number, None
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def import_players(rows, batch_size=1000):
+    """Create a ``User`` and a ``Player`` for every row, ``batch_size`` rows at a time.
+
+    ``rows`` yields ``(line, row)`` pairs as produced by ``iter_rows``. Rows
+    need ``name``, ``surname`` and ``mail``; an optional ``team`` column
+    holds the id of the team the player joins. Only one batch is held in
+    memory at a time.
+    """
+    report = {'rows': 0, 'created': 0, 'skipped': 0, 'errors': []}
+    rows = iter(rows)
+
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return report
+
+        team_ids = {int(row['team']) for _, row in batch
+                    if isinstance(row, dict) and str(row.get('team') or '').isdigit()}
+        known_teams = set(Team.objects.filter(id__in=team_ids).values_list('id', flat=True)) if team_ids else set()
+
+        users, team_of_user = [], []
+        for line, row in batch:
+            error = _validate(row, known_teams)
+            if error:
+                report['skipped'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append({'row': line, 'error': error})
+                continue
+            users.append(User(name=row['name'], surname=row['surname'], mail=row['mail']))
+            team_of_user.append(int(row['team']) if row.get('team') else None)
+
+        with transaction.atomic():
+            users = bulk_create_with_ids(User, users, batch_size=batch_size)
+            Player.objects.bulk_create(
+                [Player(user_id=user.pk, team_id=team_id) for user, team_id in zip(users, team_of_user)],
+                batch_size=batch_size,
+            )
+        Team.objects.filter(id__in=set(team_of_user)).touch()
+        cache.invalidate_teams(set(team_of_user))
+        report['rows'] += len(batch)
+        report['created'] += len(users)
+
+
+def _validate(row, known_teams):
+    if not isinstance(row, dict):
+        return "Row is not an object."
+    missing = [field for field in ('name', 'surname', 'mail') if not row.get(field)]
+    if missing:
+        return f"Missing fields: {', '.join(missing)}."
+    team = row.get('team')
+    if team:
+        if not str(team).isdigit() or int(team) not in known_teams:
+            return f"Team not found: {team}."
+    return None
@@ -0,0 +1,149 @@
+"""Batched ``MatchEvent`` ingestion.
+
+``save_events`` writes a batch of events with one ``bulk_create``. With
+``EVENT_WRITE_BEHIND`` enabled, ``event_buffer`` instead coalesces events
+from many requests and writes them together once ``EVENT_BUFFER_MAX_SIZE``
+events are waiting or ``EVENT_BUFFER_FLUSH_SECONDS`` have passed, so a busy
+weekend costs a few large SQLite write transactions instead of one per event.
+Buffered events are flushed at interpreter exit and on ASGI lifespan
+shutdown.
+"""
+import atexit
+import itertools
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import async_views, live
+from .bulk import bulk_create_with_ids
+from .models import Match, MatchEvent
+
+logger = logging.getLogger(__name__)
+
+
+def save_events(events, batch_size=500):
+    """Insert ``events`` in one transaction and return them with ``pk`` set.
+
+    ``bulk_create`` sends no ``post_save`` signals, so the live feed is
+    notified here once the batch is committed.
+    """
+    with transaction.atomic():
+        events = bulk_create_with_ids(MatchEvent, events, batch_size=batch_size)
+        transaction.on_commit(lambda: live.publish(events))
+    return events
+
+
+class EventBuffer:
+    """Write-behind buffer of unsaved ``MatchEvent`` objects.
+
+    Every accepted event gets a sequence number, increasing in the order the
+    events were accepted, which callers get back instead of a database id.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._sequence = itertools.count(1)
+        self._timer = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, events):
+        """Queue ``events``, stamped with the time they were accepted, and return their sequence numbers.
+
+        A flush triggered by a full buffer that fails leaves the events queued
+        for the timer to retry; they were accepted, so the caller is not told
+        to send them again.
+        """
+        max_size = getattr(settings, 'EVENT_BUFFER_MAX_SIZE', 500)
+        accepted_at = timezone.now()
+        for event in events:
+            event.timestamp = accepted_at
+        with self._lock:
+            sequences = [next(self._sequence) for _ in events]
+            self._pending.extend(events)
+            full = len(self._pending) >= max_size
+            if not full:
+                self._schedule()
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing buffered match events failed; they stay queued.")
+                with self._lock:
+                    self._schedule()
+        return sequences
+
+    def _schedule(self):
+        # Called with ``_lock`` held.
+        if self._timer is None:
+            self._timer = threading.Timer(getattr(settings, 'EVENT_BUFFER_FLUSH_SECONDS', 1.0), self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write every queued event; returns how many were saved."""
+        with self._flush_lock:
+            with self._lock:
+                events, self._pending = self._pending, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not events:
+                return 0
+            # Events of a match deleted since they were accepted are dropped.
+            existing = set(Match.objects.filter(id__in={event.match_id for event in events}).values_list('id', flat=True))
+            events = [event for event in events if event.match_id in existing]
+            try:
+                save_events(events)
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = events
+                raise
+            return len(events)
+
+    def _flush_in_background(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Flushing buffered match events failed; they stay queued.")
+            with self._lock:
+                self._schedule()
+        finally:
+            close_old_connections()
+
+
+event_buffer = EventBuffer()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        event_buffer.flush()
+    except Exception:
+        logger.exception("Could not flush buffered match events at exit.")
+
+
+def lifespan_application(application):
+    """Answer ASGI lifespan events, flushing buffered events on shutdown."""
+    async def wrapper(scope, receive, send):
+        if scope['type'] != 'lifespan':
+            await application(scope, receive, send)
+            return
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_views.run_db(event_buffer.flush)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    return wrapper
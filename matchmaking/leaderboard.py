@@ -0,0 +1,64 @@
+from django.db.models import Count, Q
+
+
+class Leaderboard:
+    """Team rankings by ``Team.score``, read from ``team_score_rank_idx``.
+
+    The index orders teams by ``(-score, id)``, so the top of the table, the
+    teams around a given team and the number of teams above a score are all
+    range reads of the index rather than scans of the team table. Ranks come
+    straight from committed scores: every worker sees the same ranking, and
+    score changes need no bookkeeping beyond the ``UPDATE`` itself.
+    """
+
+    def count(self):
+        from .models import Team
+
+        return Team.objects.count()
+
+    def top(self, limit):
+        from .models import Team
+
+        rows = Team.objects.order_by('-score', 'id').values_list('id', 'name', 'score')[:limit]
+        return self._entries(rows, first={'position': 0, 'higher': 0})
+
+    def around(self, team_id, radius):
+        """The teams within ``radius`` places of ``team_id``, or None if there is no such team."""
+        from .models import Team
+
+        score = Team.objects.filter(pk=team_id).values_list('score', flat=True).first()
+        if score is None:
+            return None
+        rows = Team.objects.values_list('id', 'name', 'score')
+        # Both halves read the index from the team outwards, in opposite directions.
+        above = rows.filter(score__gte=score).exclude(score=score, id__gte=team_id).order_by('score', '-id')[:radius]
+        below = rows.filter(score__lte=score).exclude(score=score, id__lt=team_id).order_by('-score', 'id')[:radius + 1]
+        return self._entries(list(above)[::-1] + list(below))
+
+    def _entries(self, rows, first=None):
+        """Ranked entries of consecutive rows of the ranking (ties share a rank).
+
+        ``first`` is the position of the first row and the number of teams
+        above it, looked up if not given.
+        """
+        from .models import Team
+
+        rows = list(rows)
+        if not rows:
+            return []
+        if first is None:
+            first_id, _, first_score = rows[0]
+            first = Team.objects.filter(score__gte=first_score).aggregate(
+                position=Count('id', filter=Q(score__gt=first_score) | Q(id__lt=first_id)),
+                higher=Count('id', filter=Q(score__gt=first_score)),
+            )
+        entries = []
+        rank = first['higher'] + 1
+        for offset, (team_id, name, score) in enumerate(rows):
+            if offset and score != rows[offset - 1][2]:
+                rank = first['position'] + offset + 1
+            entries.append({'id': team_id, 'name': name, 'score': score, 'rank': rank})
+        return entries
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,291 @@
+"""Live ``MatchEvent`` feed streamed as Server-Sent Events.
+
+Each watched match has one ``MatchFeed`` per event loop: a ring buffer of the
+latest events plus the set of connected spectators. A new event is encoded
+once and fanned out to every spectator in memory, so spectators cost no
+database queries per event. Events saved in this process arrive through
+``publish()``; events saved by other worker processes are picked up by one
+poll per feed every ``LIVE_FEED_POLL_SECONDS``, however many spectators
+watch it. Event ids are assigned before their transaction commits, so a
+lower id can show up after a higher one: feeds remember which events they
+have delivered rather than the highest id, and each poll re-reads the last
+``LIVE_FEED_REPOLL_ROUNDS`` intervals.
+
+Django's ``StreamingHttpResponse`` cannot stream asynchronously here, so the
+feed is served by a small ASGI application that ``asgi.py`` puts in front of
+Django.
+"""
+import asyncio
+import bisect
+import json
+import re
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .async_views import run_db
+from .models import Match, MatchEvent
+
+LIVE_PATH = re.compile(r'^/api/matches/(?P<match_id>\d+)/live/$')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def event_payload(event):
+    return {
+        'id': event.id,
+        'match': event.match_id,
+        'timestamp': event.timestamp,
+        'event_type': event.event_type,
+        'description': event.description,
+    }
+
+
+def encode(payload):
+    data = json.dumps(payload, cls=DjangoJSONEncoder)
+    return f"id: {payload['id']}\nevent: match_event\ndata: {data}\n\n".encode()
+
+
+class Subscriber:
+    def __init__(self, limit):
+        self.pending = deque()
+        self.limit = limit
+        self.overflowed = False
+        self.ready = asyncio.Event()
+
+    def push(self, entries):
+        if len(self.pending) + len(entries) > self.limit:
+            # Too slow to keep up: end the stream, the client resumes with Last-Event-ID.
+            self.overflowed = True
+        else:
+            self.pending.extend(entries)
+        self.ready.set()
+
+    def drain(self, skip=()):
+        """Pending ``(event_id, chunk)`` entries, leaving out the ids in ``skip``."""
+        entries = [entry for entry in self.pending if entry[0] not in skip]
+        self.pending.clear()
+        self.ready.clear()
+        return entries
+
+
+class MatchFeed:
+    def __init__(self, match_id, loop):
+        self.match_id = match_id
+        self.loop = loop
+        self.buffer = deque(maxlen=_setting('LIVE_FEED_BUFFER_SIZE', 200))
+        # Every delivered event newer than ``horizon`` is in the buffer, which is kept in id order.
+        self.horizon = 0
+        self.buffered_ids = set()
+        self.last_id = 0
+        self.subscribers = set()
+        self.poller = None
+
+    def prime(self, payloads):
+        """Fill the buffer with the latest events (newest last) when the feed is created."""
+        if len(payloads) == self.buffer.maxlen:
+            self.horizon = payloads[0]['id'] - 1
+        self.deliver(payloads)
+
+    def deliver(self, payloads):
+        """Add events not delivered yet and fan them out; runs on the feed's event loop."""
+        fresh = []
+        for payload in sorted(payloads, key=lambda payload: payload['id']):
+            event_id = payload['id']
+            if event_id <= self.horizon or event_id in self.buffered_ids:
+                continue
+            if len(self.buffer) == self.buffer.maxlen:
+                self.horizon = self.buffer.popleft()[0]
+                self.buffered_ids.discard(self.horizon)
+            entry = (event_id, encode(payload))
+            # A late commit may carry a lower id than events already buffered.
+            self.buffer.insert(bisect.bisect(self.buffer, event_id, key=lambda entry: entry[0]), entry)
+            self.buffered_ids.add(event_id)
+            self.last_id = max(self.last_id, event_id)
+            fresh.append(entry)
+        if fresh:
+            for subscriber in self.subscribers:
+                subscriber.push(fresh)
+
+    def replay_after(self, last_event_id):
+        """Buffered entries newer than ``last_event_id``, or None if the buffer no longer reaches back that far."""
+        if last_event_id < self.horizon:
+            return None
+        return [entry for entry in self.buffer if entry[0] > last_event_id]
+
+
+class FeedRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._feeds = {}
+
+    def get(self, match_id, loop):
+        with self._lock:
+            return self._feeds.get((match_id, loop))
+
+    def add(self, feed):
+        with self._lock:
+            return self._feeds.setdefault((feed.match_id, feed.loop), feed)
+
+    def discard(self, feed):
+        with self._lock:
+            if self._feeds.get((feed.match_id, feed.loop)) is feed:
+                del self._feeds[(feed.match_id, feed.loop)]
+
+    def for_match(self, match_id):
+        with self._lock:
+            return [feed for (feed_match_id, _), feed in self._feeds.items() if feed_match_id == match_id]
+
+
+feeds = FeedRegistry()
+
+
+def publish(events):
+    """Hand newly saved events to the live feeds of their matches; safe to call from any thread."""
+    by_match = {}
+    for event in events:
+        by_match.setdefault(event.match_id, []).append(event_payload(event))
+    for match_id, payloads in by_match.items():
+        for feed in feeds.for_match(match_id):
+            # Runs after a commit: a feed whose loop has shut down must not fail the request.
+            if feed.loop.is_closed():
+                feeds.discard(feed)
+                continue
+            try:
+                feed.loop.call_soon_threadsafe(feed.deliver, payloads)
+            except RuntimeError:
+                # The loop closed since the check.
+                feeds.discard(feed)
+
+
+def _latest_events(match_id, limit):
+    events = MatchEvent.objects.filter(match_id=match_id).order_by('-id')[:limit]
+    return [event_payload(event) for event in reversed(list(events))]
+
+
+def _events_after(match_id, last_id, limit=None, exclude=()):
+    events = MatchEvent.objects.filter(match_id=match_id, id__gt=last_id).exclude(id__in=exclude).order_by('id')
+    return [event_payload(event) for event in (events[:limit] if limit else events)]
+
+
+async def _poll(feed):
+    interval = _setting('LIVE_FEED_POLL_SECONDS', 2.0)
+    # ``last_id`` as of the last few polls: reading on from the oldest picks up
+    # events whose transactions committed after a higher id was delivered.
+    marks = deque([feed.horizon], maxlen=max(_setting('LIVE_FEED_REPOLL_ROUNDS', 5), 1))
+    while True:
+        await asyncio.sleep(interval)
+        since = marks[0]
+        marks.append(feed.last_id)
+        delivered = [event_id for event_id in feed.buffered_ids if event_id > since]
+        feed.deliver(await run_db(_events_after, feed.match_id, since, feed.buffer.maxlen, delivered))
+
+
+async def _open_feed(match_id):
+    loop = asyncio.get_running_loop()
+    feed = feeds.get(match_id, loop)
+    if feed is None:
+        feed = MatchFeed(match_id, loop)
+        feed.prime(await run_db(_latest_events, match_id, feed.buffer.maxlen))
+        feed = feeds.add(feed)
+        if feed.poller is None and _setting('LIVE_FEED_POLL_SECONDS', 2.0):
+            feed.poller = loop.create_task(_poll(feed))
+    return feed
+
+
+def _close_feed(feed):
+    if not feed.subscribers:
+        feeds.discard(feed)
+        if feed.poller is not None:
+            feed.poller.cancel()
+
+
+def _last_event_id(scope):
+    for name, value in scope.get('headers', []):
+        if name == b'last-event-id':
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    query = dict(part.split('=', 1) for part in scope.get('query_string', b'').decode().split('&') if '=' in part)
+    try:
+        return int(query['last_event_id']) if 'last_event_id' in query else None
+    except ValueError:
+        return None
+
+
+async def _send_json(send, status, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+
+async def serve_feed(scope, receive, send, match_id):
+    if scope['method'] != 'GET':
+        await _send_json(send, 405, {"detail": "Method not allowed."})
+        return
+    if not await run_db(lambda: Match.objects.filter(id=match_id).exists()):
+        await _send_json(send, 404, {"detail": "Match not found."})
+        return
+
+    feed = await _open_feed(match_id)
+    subscriber = Subscriber(_setting('LIVE_FEED_SUBSCRIBER_QUEUE', 500))
+    # Register before reading the backlog so no event falls between the two.
+    feed.subscribers.add(subscriber)
+    message = None
+    try:
+        last_event_id = _last_event_id(scope)
+        if last_event_id is None:
+            backlog = list(feed.buffer)
+        else:
+            backlog = feed.replay_after(last_event_id)
+            if backlog is None:
+                payloads = await run_db(_events_after, match_id, last_event_id)
+                backlog = [(payload['id'], encode(payload)) for payload in payloads]
+        sent_ids = {event_id for event_id, _ in backlog}
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        body = b'retry: 3000\n\n' + b''.join(chunk for _, chunk in backlog)
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        message = asyncio.ensure_future(receive())
+        keepalive = _setting('LIVE_FEED_KEEPALIVE_SECONDS', 15.0)
+        while not subscriber.overflowed:
+            ready = asyncio.ensure_future(subscriber.ready.wait())
+            done, _ = await asyncio.wait({ready, message}, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED)
+            ready.cancel()
+            if message in done:
+                if message.result()['type'] == 'http.disconnect':
+                    return
+                message = asyncio.ensure_future(receive())
+            # Events that arrived while the backlog was being sent are already in it.
+            entries = subscriber.drain(skip=sent_ids)
+            body = b''.join(chunk for _, chunk in entries)
+            if body or not done:
+                await send({'type': 'http.response.body', 'body': body or b': keepalive\n\n', 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        if message is not None:
+            message.cancel()
+        feed.subscribers.discard(subscriber)
+        _close_feed(feed)
+
+
+def live_feed_application(django_application):
+    """Wrap the Django ASGI application, serving the live feed path directly."""
+    async def application(scope, receive, send):
+        if scope['type'] == 'http':
+            match = LIVE_PATH.match(scope['path'])
+            if match:
+                await serve_feed(scope, receive, send, int(match.group('match_id')))
+                return
+        await django_application(scope, receive, send)
+    return application
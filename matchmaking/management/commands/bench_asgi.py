@@ -0,0 +1,89 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test import RequestFactory
+
+from matchmaking.models import Match, Team
+
+
+def _summary(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = ("Compare the sync (WSGI, one thread per client) and async (ASGI) read endpoints in-process "
+            "under the same number of concurrent clients, against the configured database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50)
+
+    def handle(self, *args, **options):
+        pairs = [
+            ('/api/teams/', '/api/async/teams/'),
+            ('/api/leaderboard/', '/api/async/leaderboard/'),
+        ]
+        team_id = Team.objects.order_by('id').values_list('id', flat=True).first()
+        if team_id:
+            pairs.append((f'/api/teams/{team_id}/', f'/api/async/teams/{team_id}/'))
+        match_id = Match.objects.order_by('id').values_list('id', flat=True).first()
+        if match_id:
+            pairs.append((f'/api/matches/{match_id}/', f'/api/async/matches/{match_id}/'))
+        total, concurrency = options['requests'], options['concurrency']
+        for sync_path, async_path in pairs:
+            wsgi = self.bench_wsgi(sync_path, total, concurrency)
+            asgi = asyncio.run(self.bench_asgi(async_path, total, concurrency))
+            for label, path, result in (('wsgi', sync_path, wsgi), ('asgi', async_path, asgi)):
+                self.stdout.write(f"{label} {path:<28} {result['rps']:8.0f} req/s  "
+                                  f"p50 {result['p50_ms']:7.2f}ms  p99 {result['p99_ms']:7.2f}ms")
+
+    def bench_wsgi(self, path, total, concurrency):
+        application = get_wsgi_application()
+        environ = RequestFactory().get(path, HTTP_HOST='localhost').environ
+
+        def one(_):
+            started = time.perf_counter()
+            body = application(dict(environ), lambda status, headers: None)
+            b''.join(body)
+            body.close()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one, range(total)))
+        return _summary(latencies, time.perf_counter() - started)
+
+    async def bench_asgi(self, path, total, concurrency):
+        application = get_asgi_application()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+            'headers': [(b'host', b'localhost')], 'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+        }
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            pass
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                await application(dict(scope), receive, send)
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(total)))
+        return _summary(latencies, time.perf_counter() - started)
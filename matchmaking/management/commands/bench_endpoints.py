@@ -0,0 +1,65 @@
+import json
+import platform
+from datetime import datetime
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from matchmaking import benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway test database and measure p50/p99 latency and SQL query count of every route "
+            "in matchmaking/urls.py.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=200)
+        parser.add_argument('--players', type=int, default=2000)
+        parser.add_argument('--matches', type=int, default=5000)
+        parser.add_argument('--events', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--route', help="Only benchmark routes whose pattern contains this text.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--check-budgets', action='store_true',
+                            help="Fail if a route exceeds its query budget or has no benchmark.")
+
+    def handle(self, *args, **options):
+        uncovered = benchmarks.uncovered_routes()
+        config = {key: options[key] for key in ('teams', 'players', 'matches', 'events', 'seed', 'iterations', 'warmup')}
+
+        with benchmarks.scratch_database():
+            fixture = benchmarks.seed(options['teams'], options['players'], options['matches'], options['events'],
+                                      seed=options['seed'])
+            results = benchmarks.run(fixture, options['iterations'], options['warmup'], only=options['route'])
+
+        for result in results:
+            queries = '-' if result['queries'] is None else result['queries']
+            budget = '-' if result['budget'] is None else result['budget']
+            self.stdout.write(f"{result['method']:<6} {result['route']:<48} p50 {result['p50_ms']:8.2f}ms  "
+                              f"p99 {result['p99_ms']:8.2f}ms  queries {queries:>3}/{budget:<3} "
+                              f"status {','.join(map(str, result['statuses']))}")
+
+        if options['output']:
+            report = {
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'config': config,
+                'uncovered_routes': uncovered,
+                'results': results,
+            }
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Wrote {len(results)} results to {options['output']}.")
+
+        if options['check_budgets']:
+            problems = [f"{r['method']} {r['route']}: {r['queries']} queries, budget {r['budget']}"
+                        for r in benchmarks.over_budget(results)]
+            problems += [f"{pattern}: no benchmark" for pattern in uncovered]
+            if problems:
+                raise CommandError("Query budget check failed:\n" + "\n".join(problems))
+            self.stdout.write("All routes within their query budgets.")
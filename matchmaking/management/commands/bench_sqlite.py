@@ -0,0 +1,45 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from matchmaking import benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Measure write/read throughput under contention (concurrent score propositions and match-history "
+            "reads) on a throwaway copy of the configured database. Run it once with the default settings and "
+            "once with football_matchmaking.settings_production to compare SQLite modes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=10.0)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--teams', type=int, default=200)
+        parser.add_argument('--matches', type=int, default=20000)
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        with benchmarks.scratch_database():
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+            fixture = benchmarks.seed(teams=options['teams'], players=options['teams'] * 10,
+                                      matches=options['matches'], events=0)
+            results = benchmarks.contention(fixture, options['seconds'], options['writers'], options['readers'])
+
+        mode = {
+            'settings': settings.SETTINGS_MODULE,
+            'journal_mode': journal_mode,
+            'routers': settings.DATABASE_ROUTERS,
+            'writers': options['writers'],
+            'readers': options['readers'],
+        }
+        self.stdout.write(f"{mode['settings']} (journal_mode={journal_mode})")
+        for kind, result in results.items():
+            self.stdout.write(f"  {kind:<6} {result['per_second']:8.1f}/s  p50 {result['p50_ms']}ms  "
+                              f"p99 {result['p99_ms']}ms  errors {result['errors']}")
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'mode': mode, 'results': results}, output, indent=2)
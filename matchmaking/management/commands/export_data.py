@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from matchmaking import exporters
+
+
+class Command(BaseCommand):
+    help = "Stream matches, score propositions or match events as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exporters.DATASETS))
+        parser.add_argument('--format', choices=exporters.FORMATS, default='ndjson')
+        parser.add_argument('--since', help=("Only rows updated (matches, propositions) or recorded (events) "
+                                             "on or after this date/datetime."))
+        parser.add_argument('--output', help="File to write to; defaults to stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            since = exporters.parse_since(options['since']) if options['since'] else None
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        records = exporters.iter_records(options['dataset'], since)
+        lines = exporters.render(options['dataset'], options['format'], records)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,43 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from matchmaking.synthetic import START_DATE, generate
+
+
+class Command(BaseCommand):
+    help = ("Generate a deterministic synthetic league (users, players, teams, matches with score "
+            "propositions, agreed scores and events) for scale testing.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=1000)
+        parser.add_argument('--players', type=int, default=20000)
+        parser.add_argument('--matches', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--days', type=int, default=730, help="Spread matches over this many days.")
+        parser.add_argument('--start-date', type=date.fromisoformat, default=START_DATE,
+                            help="First day of the league (YYYY-MM-DD).")
+        parser.add_argument('--free-agents', type=float, default=0.1, help="Share of players without a team.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-ratings', action='store_true', help="Do not rebuild Elo ratings afterwards.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(done, total):
+            if options['verbosity'] > 1 or done == total:
+                self.stdout.write(f"{done}/{total} matches ({time.perf_counter() - started:.1f}s)")
+
+        try:
+            created = generate(
+                teams=options['teams'], players=options['players'], matches=options['matches'],
+                seed=options['seed'], days=options['days'], free_agent_share=options['free_agents'],
+                batch_size=options['batch_size'], with_ratings=not options['skip_ratings'], progress=progress,
+                start_date=options['start_date'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        summary = ', '.join(f"{count} {name}" for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {time.perf_counter() - started:.1f}s."))
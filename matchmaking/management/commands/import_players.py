@@ -0,0 +1,36 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from matchmaking.importers import import_players, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Stream users and players from a CSV or JSONL file (columns: name, surname, mail, optional team)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        started = time.perf_counter()
+        try:
+            with open(path, encoding='utf-8', newline='') as lines:
+                report = import_players(iter_rows(lines, fmt), batch_size=options['batch_size'])
+        except OSError as exc:
+            raise CommandError(exc)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise CommandError(f"Could not parse {path}: {exc}")
+        elapsed = time.perf_counter() - started
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} players from {report['rows']} rows "
+            f"({report['skipped']} skipped) in {elapsed:.1f}s."
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from matchmaking.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Replay every agreed match in chronological order and recompute Team.rating (Elo)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        matches, teams = rebuild_ratings(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt ratings for {teams} teams from {matches} matches in {elapsed:.2f}s."
+        ))
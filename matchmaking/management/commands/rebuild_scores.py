@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum
+
+from matchmaking import cache
+from matchmaking.models import Match, Team
+
+
+class Command(BaseCommand):
+    help = "Recompute Team.score from the full match history, in batches of teams."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        team_ids = list(Team.objects.order_by('id').values_list('id', flat=True))
+        updated = 0
+
+        for start in range(0, len(team_ids), batch_size):
+            batch = team_ids[start:start + batch_size]
+            scores = dict.fromkeys(batch, 0)
+
+            inviting = (Match.objects.filter(inviting_team_id__in=batch)
+                        .values('inviting_team_id').annotate(total=Sum('inviting_score')))
+            for row in inviting:
+                scores[row['inviting_team_id']] += row['total'] or 0
+
+            guest = (Match.objects.filter(guest_team_id__in=batch)
+                     .values('guest_team_id').annotate(total=Sum('guest_score')))
+            for row in guest:
+                scores[row['guest_team_id']] += row['total'] or 0
+
+            with transaction.atomic():
+                Team.objects.bulk_update(
+                    [Team(id=team_id, score=score, version=F('version') + 1) for team_id, score in scores.items()],
+                    ['score', 'version'],
+                )
+            cache.invalidate_teams(batch)
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt scores for {updated} teams."))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from matchmaking.matcher import run_matching_pass
+
+
+class Command(BaseCommand):
+    help = "Pair queued teams by rating and create their matches, every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30.0)
+        parser.add_argument('--once', action='store_true', help="Run a single pass and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            created = run_matching_pass()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"Created {created} matches in {elapsed * 1000:.1f}ms.")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
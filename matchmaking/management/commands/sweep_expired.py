@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from matchmaking.expiry import sweep
+
+
+class Command(BaseCommand):
+    help = "Expire overdue team requests and pending matches and delete overdue player invites."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping every --interval seconds.")
+        parser.add_argument('--interval', type=float, default=300.0)
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            processed = sweep(batch_size=options['batch_size'])
+            elapsed = time.perf_counter() - started
+            summary = ', '.join(f"{name}: {count}" for name, count in processed.items())
+            self.stdout.write(f"Swept {summary} in {elapsed * 1000:.1f}ms.")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,79 @@
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Match, QueueTicket
+
+
+def pair_by_rating(ratings):
+    """Pair queued teams so that the total rating difference is minimal.
+
+    For an even number of teams the optimum is to sort by rating and pair
+    neighbours. For an odd number, one team sits out; trying every even
+    position in the sorted order is done with prefix/suffix sums, so the whole
+    pass is O(n log n). Returns a list of ``(i, j)`` index pairs into
+    ``ratings``.
+    """
+    ratings = np.asarray(ratings, dtype=np.float64)
+    n = len(ratings)
+    if n < 2:
+        return []
+
+    order = np.argsort(ratings, kind='stable')
+    if n % 2 == 0:
+        return list(zip(order[0::2].tolist(), order[1::2].tolist()))
+
+    gaps = np.diff(ratings[order])
+    # Leaving out sorted position 2m pairs (0,1)...(2m-2,2m-1) before it and
+    # (2m+1,2m+2)... after it: gaps[0:2m:2] + gaps[2m+1::2].
+    before = np.concatenate(([0.0], np.cumsum(gaps[0::2])))
+    after = np.concatenate((np.cumsum(gaps[1::2][::-1])[::-1], [0.0]))
+    skip = 2 * int(np.argmin(before + after))
+
+    kept = np.delete(order, skip)
+    return list(zip(kept[0::2].tolist(), kept[1::2].tolist()))
+
+
+def run_matching_pass():
+    """Pair every waiting ticket in one batch and create the matches.
+
+    Returns the number of matches created.
+    """
+    with transaction.atomic():
+        tickets = list(QueueTicket.objects.filter(status='WAITING')
+                       .select_for_update(of=('self',))
+                       .order_by('created_at', 'id')
+                       .values_list('id', 'team_id', 'team__rating'))
+        pairs = pair_by_rating([rating for _, _, rating in tickets])
+        if not pairs:
+            return 0
+
+        now = timezone.now()
+        paired_ids = [tickets[index][0] for pair in pairs for index in pair]
+        # Claim the tickets only if they are still waiting: where rows cannot be
+        # locked, a team may have left the queue since they were read.
+        claimed = QueueTicket.objects.filter(id__in=paired_ids, status='WAITING').update(status='MATCHED', matched_at=now)
+        if claimed < len(paired_ids):
+            lost = set(QueueTicket.objects.filter(id__in=paired_ids).exclude(status='MATCHED', matched_at=now)
+                       .values_list('id', flat=True))
+            pairs = [(i, j) for i, j in pairs if tickets[i][0] not in lost and tickets[j][0] not in lost]
+            # The partners of cancelled tickets go back to the queue.
+            released = set(paired_ids) - lost - {tickets[index][0] for pair in pairs for index in pair}
+            QueueTicket.objects.filter(id__in=released).update(status='WAITING', matched_at=None)
+
+        today = now.date()
+        matches = []
+        matched_tickets = []
+        for i, j in pairs:
+            ticket_i, team_i, _ = tickets[i]
+            ticket_j, team_j, _ = tickets[j]
+            # The team that queued first hosts the game.
+            if ticket_j < ticket_i:
+                ticket_i, team_i, ticket_j, team_j = ticket_j, team_j, ticket_i, team_i
+            matches.append(Match(inviting_team_id=team_i, guest_team_id=team_j, status='PENDING', created_at=today))
+            matched_tickets.append(QueueTicket(id=ticket_i, opponent_id=team_j))
+            matched_tickets.append(QueueTicket(id=ticket_j, opponent_id=team_i))
+
+        Match.objects.bulk_create(matches, batch_size=500)
+        QueueTicket.objects.bulk_update(matched_tickets, ['opponent'], batch_size=500)
+    return len(matches)
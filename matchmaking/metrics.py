@@ -0,0 +1,157 @@
+"""Per-request instrumentation, served in the Prometheus text format at ``/metrics``.
+
+``RequestMetricsMiddleware`` records, per route name and method, the wall
+time, SQL query count, SQL time and response size of every request into
+fixed-bucket histograms. Recording is a few additions under one lock, and
+queries are counted with ``execute_wrapper`` instead of being captured, so
+it is cheap enough to leave on. Queries that async views run on pool threads
+are not counted.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import cache
+
+slow_log = logging.getLogger('matchmaking.slow')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One counter per bucket plus +Inf; made cumulative when rendered.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# metric name -> (help text, buckets, field of ``RequestMetrics.observe``)
+HISTOGRAMS = {
+    'matchmaking_http_request_duration_seconds': ("Wall time of a request.", DURATION_BUCKETS, 'duration'),
+    'matchmaking_http_request_sql_queries': ("SQL queries issued by a request.", QUERY_BUCKETS, 'queries'),
+    'matchmaking_http_request_sql_duration_seconds': ("Time spent in SQL by a request.", DURATION_BUCKETS, 'sql_time'),
+    'matchmaking_http_response_size_bytes': ("Size of non-streaming response bodies.", SIZE_BUCKETS, 'size'),
+}
+
+
+def _label(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (route, method) -> {metric name: Histogram}
+            self._series = {}
+            # (route, method, status) -> count
+            self._requests = {}
+
+    def observe(self, route, method, status, duration, queries, sql_time, size):
+        values = {'duration': duration, 'queries': queries, 'sql_time': sql_time, 'size': size}
+        with self._lock:
+            series = self._series.get((route, method))
+            if series is None:
+                series = self._series[(route, method)] = {
+                    name: Histogram(buckets) for name, (_, buckets, _) in HISTOGRAMS.items()
+                }
+            for name, (_, _, field) in HISTOGRAMS.items():
+                if values[field] is not None:
+                    series[name].observe(values[field])
+            key = (route, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def render(self):
+        lines = [
+            "# HELP matchmaking_http_requests_total Requests by route, method and status.",
+            "# TYPE matchmaking_http_requests_total counter",
+        ]
+        with self._lock:
+            for (route, method, status), count in sorted(self._requests.items()):
+                lines.append(f'matchmaking_http_requests_total{{route="{_label(route)}",method="{method}",'
+                             f'status="{status}"}} {count}')
+            for name, (help_text, buckets, _) in HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (route, method), series in sorted(self._series.items()):
+                    histogram = series[name]
+                    labels = f'route="{_label(route)}",method="{method}"'
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+        cache_stats = cache.stats.snapshot()
+        for field in ('hits', 'misses'):
+            lines += [f"# HELP matchmaking_response_cache_{field}_total Response cache {field}.",
+                      f"# TYPE matchmaking_response_cache_{field}_total counter",
+                      f"matchmaking_response_cache_{field}_total {cache_stats[field]}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = RequestMetrics()
+
+
+class QueryCounter:
+    """``execute_wrapper`` that counts and times queries and logs slow ones."""
+
+    def __init__(self, slow_sql_seconds):
+        self.count = 0
+        self.duration = 0.0
+        self.slow_sql_seconds = slow_sql_seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if elapsed >= self.slow_sql_seconds:
+                slow_log.warning("Slow SQL (%.1fms) on %s: %s", elapsed * 1000, context['connection'].alias, sql)
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter(getattr(settings, 'METRICS_SLOW_SQL_MS', 100) / 1000)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        route = (match.url_name or match.route) if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        metrics.observe(route, request.method, response.status_code, duration, counter.count, counter.duration, size)
+
+        if duration * 1000 >= getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500):
+            slow_log.warning("Slow request %s %s (%s): %.1fms, %d queries in %.1fms", request.method,
+                             request.path, route, duration * 1000, counter.count, counter.duration * 1000)
+        if getattr(settings, 'METRICS_SERVER_TIMING', False):
+            response['Server-Timing'] = (f'app;dur={duration * 1000:.1f}, '
+                                         f'db;dur={counter.duration * 1000:.1f};desc="{counter.count} queries"')
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.20 on 2026-10-18 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0004_teamrequest_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='rating',
+            field=models.FloatField(default=1500.0),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.20 on 2026-10-18 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0005_team_rating'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['is_public', 'rating'], name='team_public_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['is_public', 'score'], name='team_public_score_idx'),
+        ),
+    ]
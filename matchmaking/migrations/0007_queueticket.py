@@ -0,0 +1,33 @@
+# Generated by Django 3.2.20 on 2026-10-18 14:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0006_team_opponent_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueueTicket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('WAITING', 'Waiting'), ('MATCHED', 'Matched'), ('CANCELLED', 'Cancelled')], default='WAITING', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('matched_at', models.DateTimeField(blank=True, null=True)),
+                ('opponent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='matchmaking.team')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_tickets', to='matchmaking.team')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='queueticket',
+            index=models.Index(fields=['status', 'created_at'], name='queue_status_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='queueticket',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'WAITING')), fields=('team',), name='queue_one_waiting_ticket'),
+        ),
+    ]
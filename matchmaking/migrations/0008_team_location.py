@@ -0,0 +1,27 @@
+# Generated by Django 3.2.20 on 2026-10-18 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0007_queueticket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['latitude', 'longitude'], name='team_location_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.20 on 2026-10-18 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0008_team_location'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['inviting_team', 'status'], name='match_inviting_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['guest_team', 'status'], name='match_guest_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['inviting_team', 'created_at'], name='match_inviting_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['guest_team', 'created_at'], name='match_guest_created_idx'),
+        ),
+    ]
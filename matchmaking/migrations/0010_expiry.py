@@ -0,0 +1,36 @@
+# Generated by Django 3.2.20 on 2026-10-18 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0009_match_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='match',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('ONGOING', 'Ongoing'), ('COMPLETED', 'Completed'), ('EXPIRED', 'Expired')], default='PENDING', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='playerinvite',
+            name='expire_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='teamrequest',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('ACCEPTED', 'Accepted'), ('DECLINED', 'Declined'), ('EXPIRED', 'Expired')], default='PENDING', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['status', 'expires_at'], name='match_status_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teamrequest',
+            index=models.Index(fields=['status', 'expire_date'], name='teamrequest_status_expire_idx'),
+        ),
+    ]
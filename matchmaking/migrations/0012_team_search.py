@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# External-content FTS5 index over Team.name, kept in sync by triggers so that
+# bulk inserts and queryset updates are indexed as well as save() and delete().
+CREATE = [
+    """CREATE VIRTUAL TABLE matchmaking_team_search USING fts5(
+        name, content='matchmaking_team', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER matchmaking_team_search_insert AFTER INSERT ON matchmaking_team BEGIN
+        INSERT INTO matchmaking_team_search(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER matchmaking_team_search_delete AFTER DELETE ON matchmaking_team BEGIN
+        INSERT INTO matchmaking_team_search(matchmaking_team_search, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER matchmaking_team_search_update AFTER UPDATE OF name ON matchmaking_team
+    WHEN old.name IS NOT new.name BEGIN
+        INSERT INTO matchmaking_team_search(matchmaking_team_search, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO matchmaking_team_search(rowid, name) VALUES (new.id, new.name);
+    END""",
+    "INSERT INTO matchmaking_team_search(matchmaking_team_search) VALUES ('rebuild')",
+]
+
+DROP = [
+    "DROP TRIGGER IF EXISTS matchmaking_team_search_update",
+    "DROP TRIGGER IF EXISTS matchmaking_team_search_delete",
+    "DROP TRIGGER IF EXISTS matchmaking_team_search_insert",
+    "DROP TABLE IF EXISTS matchmaking_team_search",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite only; other databases fall back to LIKE (see matchmaking.search).
+        if schema_editor.connection.vendor == 'sqlite':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0011_version_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE), _run(DROP)),
+    ]
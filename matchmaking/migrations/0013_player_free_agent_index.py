@@ -0,0 +1,17 @@
+# Generated by Django 3.2.20 on 2026-10-18 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0012_team_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(condition=models.Q(('team__isnull', True)), fields=['id'], name='player_free_agent_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.20 on 2026-10-18 14:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0013_player_free_agent_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeadToHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matches', models.PositiveIntegerField(default=0)),
+                ('low_wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('high_wins', models.PositiveIntegerField(default=0)),
+                ('low_goals', models.PositiveIntegerField(default=0)),
+                ('high_goals', models.PositiveIntegerField(default=0)),
+                ('last_played', models.DateField(blank=True, null=True)),
+                ('last_match', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='matchmaking.match')),
+                ('team_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='matchmaking.team')),
+                ('team_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='matchmaking.team')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='headtohead',
+            constraint=models.UniqueConstraint(fields=('team_low', 'team_high'), name='headtohead_pair'),
+        ),
+        migrations.AddConstraint(
+            model_name='headtohead',
+            constraint=models.CheckConstraint(check=models.Q(('team_low__lt', django.db.models.expressions.F('team_high'))), name='headtohead_ordered_pair'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.20 on 2026-10-18 14:55
+
+from django.db import migrations, models
+import matchmaking.ratings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0014_headtohead'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='rating_delta',
+            field=models.FloatField(default=0.0),
+        ),
+        # Defaults live in Python only; altering the column would make SQLite
+        # rebuild matchmaking_team and drop the search triggers of 0012.
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='team',
+                name='rating',
+                field=models.FloatField(default=matchmaking.ratings.initial_rating),
+            ),
+        ]),
+    ]
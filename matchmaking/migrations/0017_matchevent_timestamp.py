@@ -0,0 +1,19 @@
+# Generated by Django 3.2.20 on 2026-10-18 15:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0016_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='matchevent',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
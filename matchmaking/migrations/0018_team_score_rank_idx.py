@@ -0,0 +1,17 @@
+# Generated by Django 3.2.20 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0017_matchevent_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['-score', 'id'], name='team_score_rank_idx'),
+        ),
+    ]
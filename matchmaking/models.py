@@ -1,8 +1,10 @@
-from django.db import models
-from django.db.models import Sum, Count
-from django.db.models.functions import Coalesce
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Value, When
 from django.utils import timezone
 
+from . import cache, headtohead, ratings
+from .db import write_transaction
+
 
 class User(models.Model):
     name = models.CharField(max_length=60)
@@ -17,10 +19,94 @@ class User(models.Model):
         return self.name + ' ' + self.surname
 
 
-class Team(models.Model):
+class VersionedQuerySet(models.QuerySet):
+    def touch(self, **changes):
+        """Apply ``changes`` and bump ``version`` on every row, in one UPDATE.
+
+        Called with no changes, it marks rows whose content changed elsewhere
+        (e.g. a related row) so their ETags move on.
+        """
+        return self.update(version=F('version') + 1, **changes)
+
+
+class VersionedModel(models.Model):
+    """A model with a ``version`` counter, served as its ETag.
+
+    The counter is bumped in the database (see ``signals`` and
+    ``VersionedQuerySet.touch``), never from the in-memory value, so ``save()``
+    leaves it out to avoid writing back a stale version. Subclasses list
+    other fields maintained the same way in ``counter_fields``. A plain
+    ``save()`` of an existing row never writes them, and raises ValueError if
+    one of them was changed in memory: write those with
+    ``save(update_fields=...)`` or an F() update instead.
+    """
+    version = models.PositiveIntegerField(default=1)
+
+    counter_fields = ('version',)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._mark_counters_saved(cls.counter_fields)
+        return instance
+
+    def _mark_counters_saved(self, names):
+        saved = getattr(self, '_saved_counters', {})
+        saved.update({name: self.__dict__[name] for name in names if name in self.counter_fields and name in self.__dict__})
+        self._saved_counters = saved
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._mark_counters_saved(self.counter_fields if fields is None else fields)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if not self._state.adding and update_fields is None and not kwargs.get('force_insert'):
+            changed = [name for name, value in getattr(self, '_saved_counters', {}).items()
+                       if getattr(self, name) != value]
+            if changed:
+                raise ValueError(f"save() does not write {', '.join(changed)} of {type(self).__name__}; "
+                                 f"use save(update_fields=[...]) or an F() update.")
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.counter_fields]
+        written = self.counter_fields if self._state.adding or update_fields is None else update_fields
+        super().save(*args, **kwargs)
+        self._mark_counters_saved(written)
+
+
+class TeamQuerySet(VersionedQuerySet):
+    def with_players(self):
+        # One extra query for the whole roster of every team in the queryset,
+        # instead of one per team plus one per player for ``user``.
+        return self.prefetch_related(
+            models.Prefetch('players', queryset=Player.objects.select_related('user'))
+        )
+
+
+class Team(VersionedModel):
     name = models.CharField(max_length=120)
     is_public = models.BooleanField(default=True)
     score = models.IntegerField(default=0)
+    rating = models.FloatField(default=ratings.initial_rating)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+
+    objects = TeamQuerySet.as_manager()
+
+    # Changed with F() updates by ``add_score`` and the rebuild commands.
+    counter_fields = ('version', 'score', 'rating')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='team_location_idx'),
+            models.Index(fields=['is_public', 'rating'], name='team_public_rating_idx'),
+            models.Index(fields=['is_public', 'score'], name='team_public_score_idx'),
+            # Serves the leaderboard (see leaderboard.py).
+            models.Index(fields=['-score', 'id'], name='team_score_rank_idx'),
+        ]
 
     @property
     def matches(self):
@@ -34,19 +120,91 @@ class Team(models.Model):
     def planned_matches(self):
         return self.matches.filter(inviting_score__isnull=True).filter(guest_score__isnull=True)
 
-    def update_score(self):
-        self.score = self.inviting_matches.aggregate(sum=Coalesce(Sum('inviting_score'), 0))['sum'] + \
-                     self.guest_matches.aggregate(sum=Coalesce(Sum('guest_score'), 0))['sum']
-        self.save()
+    def match_history(self, *filters):
+        """This team's matches as a UNION ALL of two index-backed lookups.
+
+        ``matches`` ORs the two team columns together, which SQLite can only
+        answer by scanning; each branch here uses its own (team, ...) index.
+        """
+        inviting = Match.objects.filter(*filters, inviting_team=self)
+        guest = Match.objects.filter(*filters, guest_team=self)
+        return inviting.union(guest, all=True)
+
+    def pending_opponent_ids(self):
+        inviting = Match.objects.filter(inviting_team=self, status='PENDING').values_list('guest_team_id', flat=True)
+        guest = Match.objects.filter(guest_team=self, status='PENDING').values_list('inviting_team_id', flat=True)
+        return set(inviting) | set(guest)
+
+    def suggest_opponents(self, k=5, by='rating'):
+        """The ``k`` public teams closest to this one in ``rating`` (or ``score``).
+
+        Walks the (is_public, <field>) index upwards and downwards from this
+        team's value with a LIMIT on each side, so only ~2k rows are read.
+        """
+        value = getattr(self, by)
+        candidates = Team.objects.filter(is_public=True).exclude(pk__in={self.pk} | self.pending_opponent_ids())
+        above = candidates.filter(**{f'{by}__gte': value}).order_by(by, 'id')[:k]
+        below = candidates.filter(**{f'{by}__lt': value}).order_by(f'-{by}', 'id')[:k]
+        return sorted(list(above) + list(below), key=lambda team: (abs(getattr(team, by) - value), team.id))[:k]
+
+    def add_score(self, delta, rating_delta=0.0):
+        Team.add_scores([(self, delta, rating_delta)])
+
+    @staticmethod
+    def add_scores(changes):
+        """Add ``(team, delta, rating_delta)`` changes to score and rating, all in one UPDATE."""
+        teams, totals = {}, {}
+        for team, delta, rating_delta in changes:
+            teams.setdefault(team.pk, []).append(team)
+            score_total, rating_total = totals.get(team.pk, (0, 0.0))
+            totals[team.pk] = (score_total + delta, rating_total + rating_delta)
+        totals = {pk: total for pk, total in totals.items() if any(total)}
+        if not totals:
+            return
+
+        def per_team(index, output_field):
+            return Case(*[When(pk=pk, then=Value(total[index])) for pk, total in totals.items()],
+                        output_field=output_field)
+
+        Team.objects.filter(pk__in=totals).update(score=F('score') + per_team(0, models.IntegerField()),
+                                                  rating=F('rating') + per_team(1, models.FloatField()),
+                                                  version=F('version') + 1)
+        for pk, (delta, rating_delta) in totals.items():
+            for team in teams[pk]:
+                team.score += delta
+                team.rating += rating_delta
+                team._mark_counters_saved(('score', 'rating'))
+        cache.invalidate_teams(list(totals))
 
     def __str__(self):
         return self.name
 
 
+class PlayerQuerySet(models.QuerySet):
+    def free_agents(self):
+        # Served by ``player_free_agent_idx``, which only holds teamless players.
+        return self.filter(team__isnull=True).select_related('user')
+
+
 class Player(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="players")
     team = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True, related_name="players")
 
+    objects = PlayerQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        player = super().from_db(db, field_names, values)
+        # The team the player was loaded with, so that saving a move can
+        # update the old roster without reading it again.
+        player._loaded_team_id = player.__dict__.get('team_id')
+        return player
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(team__isnull=True), name='player_free_agent_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.name} in {self.team.name if self.team else 'No Team'}"
 
@@ -58,21 +216,45 @@ class ScoreProposition(models.Model):
     suggesting_team = models.ForeignKey(Team, on_delete=models.CASCADE)
     note = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class MatchQuerySet(VersionedQuerySet):
+    def touch(self, **changes):
+        """Apply ``changes``, bump ``version`` and refresh ``updated_at`` on every row, in one UPDATE."""
+        return super().touch(updated_at=timezone.now(), **changes)
 
+    def lock(self, pk):
+        """Load match ``pk`` with its teams and propositions, locked for update.
 
-class Match(models.Model):
+        Must run inside ``db.write_transaction()``, which also takes the write
+        lock on SQLite, where ``select_for_update()`` does nothing.
+        """
+        return (self.select_for_update()
+                .select_related('inviting_team', 'guest_team', 'host_proposition', 'guest_proposition')
+                .get(pk=pk))
+
+
+class Match(VersionedModel):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
         ('ONGOING', 'Ongoing'),
         ('COMPLETED', 'Completed'),
+        ('EXPIRED', 'Expired'),
     ]
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
 
     created_at = models.DateField(default=timezone.now)
+    # Set by ``MatchQuerySet.touch`` with every version bump; incremental
+    # exports filter on it.
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
     expires_at = models.DateField(null=True, blank=True)
     suggested_at = models.DateField(null=True, blank=True)
     inviting_score = models.IntegerField(null=True, blank=True)
     guest_score = models.IntegerField(null=True, blank=True)
+    # Rating points the agreed score moved from the guest to the inviting
+    # team, so that a corrected score can take them back.
+    rating_delta = models.FloatField(default=0.0)
 
     inviting_team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='inviting_matches', null=True, blank=True)
     guest_team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='guest_matches', null=True, blank=True)
@@ -80,6 +262,17 @@ class Match(models.Model):
     host_proposition = models.OneToOneField(ScoreProposition, null=True, blank=True, on_delete=models.SET_NULL, related_name='match_h')
     guest_proposition = models.OneToOneField(ScoreProposition, null=True, blank=True, on_delete=models.SET_NULL, related_name='match_g')
 
+    objects = MatchQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inviting_team', 'status'], name='match_inviting_status_idx'),
+            models.Index(fields=['guest_team', 'status'], name='match_guest_status_idx'),
+            models.Index(fields=['inviting_team', 'created_at'], name='match_inviting_created_idx'),
+            models.Index(fields=['guest_team', 'created_at'], name='match_guest_created_idx'),
+            models.Index(fields=['status', 'expires_at'], name='match_status_expires_idx'),
+        ]
+
     def other_team(self, my_team):
         return self.guest_team if my_team == self.inviting_team else self.inviting_team
 
@@ -89,34 +282,80 @@ class Match(models.Model):
     def opponent_score_proposition(self, my_team):
         return self.guest_proposition if my_team == self.inviting_team else self.host_proposition
 
-    def update_proposition(self, team, my_score, opponent_score):
-        if team == self.inviting_team:
-            if self.host_proposition:
-                self.host_proposition.inviting_score = my_score
-                self.host_proposition.guest_score = opponent_score
-                self.host_proposition.save()
+    @classmethod
+    def propose_score(cls, match_id, team_id, my_score, opponent_score):
+        """Record a team's proposed score and apply the result once both teams agree.
+
+        Runs in one transaction on a freshly locked copy of the match, so
+        concurrent submissions from both teams are applied one after the
+        other. Returns the updated match; raises ``DoesNotExist`` for an
+        unknown match and ``ValueError`` for a negative score or a team that
+        does not play in it.
+        """
+        if my_score < 0 or opponent_score < 0:
+            raise ValueError("Scores cannot be negative.")
+        with write_transaction():
+            match = cls.objects.lock(match_id)
+            if team_id == match.inviting_team_id:
+                proposition, inviting_score, guest_score = match.host_proposition, my_score, opponent_score
+            elif team_id == match.guest_team_id:
+                proposition, inviting_score, guest_score = match.guest_proposition, opponent_score, my_score
             else:
-                self.host_proposition = ScoreProposition(inviting_score=my_score, guest_score=opponent_score, suggesting_team=team)
-                self.host_proposition.save()
-        elif team == self.guest_team:
-            if self.guest_proposition:
-                self.guest_proposition.inviting_score = opponent_score
-                self.guest_proposition.guest_score = my_score
-                self.guest_proposition.save()
+                raise ValueError("Team does not play in this match.")
+
+            if proposition is None:
+                proposition = ScoreProposition.objects.create(
+                    inviting_score=inviting_score, guest_score=guest_score, suggesting_team_id=team_id)
+                if team_id == match.inviting_team_id:
+                    match.host_proposition = proposition
+                else:
+                    match.guest_proposition = proposition
             else:
-                self.guest_proposition = ScoreProposition(inviting_score=opponent_score, guest_score=my_score, suggesting_team=team)
-                self.guest_proposition.save()
-
-        if self.guest_proposition and self.host_proposition:
-            if (self.guest_proposition.guest_score == self.host_proposition.guest_score and
-                    self.guest_proposition.inviting_score == self.host_proposition.inviting_score):
-                self.inviting_score = self.host_proposition.inviting_score
-                self.guest_score = self.guest_proposition.guest_score
-
-        self.save()
-        self.inviting_team.update_score()
-        self.guest_team.update_score()
+                ScoreProposition.objects.filter(pk=proposition.pk).update(
+                    inviting_score=inviting_score, guest_score=guest_score, updated_at=timezone.now())
+                proposition.inviting_score, proposition.guest_score = inviting_score, guest_score
+
+            old_inviting_score, old_guest_score = match.inviting_score, match.guest_score
+            host, guest = match.host_proposition, match.guest_proposition
+            if host and guest and (host.inviting_score, host.guest_score) == (guest.inviting_score, guest.guest_score):
+                match.inviting_score, match.guest_score = host.inviting_score, host.guest_score
+
+            # A newly agreed or corrected score replaces the rating change of the
+            # previous one, computed from the ratings as they were before it.
+            rating_delta = 0.0
+            score_changed = (match.inviting_score is not None and
+                             (match.inviting_score, match.guest_score) != (old_inviting_score, old_guest_score))
+            if score_changed:
+                old_rating_delta = match.rating_delta
+                match.rating_delta = ratings.rating_change(match.inviting_team.rating - old_rating_delta,
+                                                           match.guest_team.rating + old_rating_delta,
+                                                           match.inviting_score, match.guest_score)
+                rating_delta = match.rating_delta - old_rating_delta
+
+            # ``touch`` bumps the version in the same UPDATE; ``update`` sends no post_save.
+            cls.objects.filter(pk=match.pk).touch(
+                host_proposition=match.host_proposition, guest_proposition=match.guest_proposition,
+                inviting_score=match.inviting_score, guest_score=match.guest_score, rating_delta=match.rating_delta)
+            match.version += 1
+            match._mark_counters_saved(('version',))
+
+            # Apply only the change in the agreed score instead of re-aggregating
+            # the whole match history of both teams: one UPDATE of both teams'
+            # scores and ratings. Both teams were loaded (and locked) with the match.
+            Team.add_scores([
+                (match.inviting_team, int(match.inviting_score or 0) - int(old_inviting_score or 0), rating_delta),
+                (match.guest_team, int(match.guest_score or 0) - int(old_guest_score or 0), -rating_delta),
+            ])
+            if score_changed:
+                headtohead.record_result(match, old_inviting_score, old_guest_score)
+            cache.invalidate_matches([match.pk])
+        return match
 
+    def update_proposition(self, team, my_score, opponent_score):
+        match = Match.propose_score(self.pk, team.pk, my_score, opponent_score)
+        for field in ('inviting_score', 'guest_score', 'rating_delta', 'host_proposition', 'guest_proposition',
+                      'version'):
+            setattr(self, field, getattr(match, field))
         return True
 
     def __str__(self):
@@ -125,13 +364,13 @@ class Match(models.Model):
 
 class MatchEvent(models.Model):
     match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name="events")
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     event_type = models.CharField(max_length=100)  # e.g., "Goal", "Penalty"
     description = models.TextField(blank=True, null=True)
 
 
 class PlayerInvite(models.Model):
-    expire_date = models.DateField(null=True, blank=True)
+    expire_date = models.DateField(null=True, blank=True, db_index=True)
     player = models.ForeignKey(Player, on_delete=models.CASCADE)
     team = models.ForeignKey(Team, on_delete=models.CASCADE)
 
@@ -141,6 +380,7 @@ class TeamRequest(models.Model):
         ('PENDING', 'Pending'),
         ('ACCEPTED', 'Accepted'),
         ('DECLINED', 'Declined'),
+        ('EXPIRED', 'Expired'),
     ]
 
     expire_date = models.DateField(null=True, blank=True)
@@ -149,6 +389,59 @@ class TeamRequest(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     message = models.TextField(null=True, blank=True)  # Optional message from the player
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expire_date'], name='teamrequest_status_expire_idx'),
+        ]
+
 
 
 
+
+
+class QueueTicket(models.Model):
+    STATUS_CHOICES = [
+        ('WAITING', 'Waiting'),
+        ('MATCHED', 'Matched'),
+        ('CANCELLED', 'Cancelled'),
+    ]
+
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='queue_tickets')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='WAITING')
+    opponent = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    matched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='queue_status_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['team'], condition=models.Q(status='WAITING'), name='queue_one_waiting_ticket'),
+        ]
+
+
+class HeadToHead(models.Model):
+    """Running totals of every agreed match between two teams.
+
+    One row per pair, stored with the lower team id first; ``low_*`` and
+    ``high_*`` are from the point of view of ``team_low`` and ``team_high``.
+    Kept up to date by ``Match.propose_score`` and rebuilt from scratch by
+    ``headtohead.rebuild``.
+    """
+    team_low = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='+')
+    team_high = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='+')
+    matches = models.PositiveIntegerField(default=0)
+    low_wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    high_wins = models.PositiveIntegerField(default=0)
+    low_goals = models.PositiveIntegerField(default=0)
+    high_goals = models.PositiveIntegerField(default=0)
+    last_match = models.ForeignKey(Match, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_played = models.DateField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['team_low', 'team_high'], name='headtohead_pair'),
+            models.CheckConstraint(check=models.Q(team_low__lt=F('team_high')), name='headtohead_ordered_pair'),
+        ]
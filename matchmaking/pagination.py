@@ -0,0 +1,57 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.utils.dateparse import parse_date
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+from .params import bounded_int
+
+
+class TeamCursorPagination(CursorPagination):
+    # Keyset pagination on the primary key: every page is a "WHERE id > cursor"
+    # range scan, so the cost of a page does not depend on how deep it is.
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
+
+
+class FreeAgentCursorPagination(CursorPagination):
+    # Newest players first; ids are assigned in creation order, and each page
+    # is a range scan of the partial free-agent index.
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
+
+
+class DateKeysetPagination:
+    """Keyset pagination over ``(created_at DESC, id DESC)``.
+
+    Unlike ``CursorPagination`` it never filters the queryset itself: the
+    caller turns ``get_position()`` into a WHERE clause before building the
+    query, which lets it be pushed into each branch of a UNION.
+    """
+    page_size = 50
+    max_page_size = 200
+
+    def __init__(self, request):
+        self.request = request
+
+    def get_limit(self):
+        return bounded_int(self.request.query_params, 'limit', self.page_size, self.max_page_size)
+
+    def get_position(self):
+        """``(created_at, id)`` of the last row of the previous page, or None."""
+        token = self.request.query_params.get('cursor')
+        if not token:
+            return None
+        created_at, _, pk = urlsafe_b64decode(token.encode()).decode().partition('|')
+        created_at = parse_date(created_at)
+        if created_at is None:
+            raise ValueError('Invalid cursor.')
+        return created_at, int(pk)
+
+    def get_next_link(self, last):
+        token = urlsafe_b64encode(f'{last.created_at.isoformat()}|{last.pk}'.encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), 'cursor', token)
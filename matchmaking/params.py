@@ -0,0 +1,13 @@
+def bounded_int(params, name, default, maximum, minimum=1):
+    """Query parameter ``name`` as an int capped at ``maximum``.
+
+    Raises ValueError, with a message fit for a 400 response, if it is not an
+    integer or is below ``minimum``.
+    """
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer.") from None
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}.")
+    return min(value, maximum)
@@ -0,0 +1,145 @@
+"""Ranked full-text and autocomplete search over team names.
+
+On SQLite the ``matchmaking_team_search`` FTS5 table (migration 0012) is
+queried and ranked with ``bm25``; triggers keep it in sync with
+``matchmaking_team``. Other databases fall back to ``LIKE``. Autocomplete
+answers are kept in a small in-process LRU cache, since clients send one
+request per keystroke and the same prefixes come up again and again.
+
+A migration that makes SQLite rebuild ``matchmaking_team`` (altering or
+removing a field) silently drops the sync triggers along with the old
+table; ``ensure_search_index`` puts them back after every ``migrate``.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+from .models import Team
+
+FIELDS = ('id', 'name', 'is_public', 'score', 'rating')
+TERM = re.compile(r'\w+')
+
+# The sync triggers of migration 0012, by name.
+TRIGGERS = {
+    'matchmaking_team_search_insert': """CREATE TRIGGER matchmaking_team_search_insert AFTER INSERT ON matchmaking_team BEGIN
+        INSERT INTO matchmaking_team_search(rowid, name) VALUES (new.id, new.name);
+    END""",
+    'matchmaking_team_search_delete': """CREATE TRIGGER matchmaking_team_search_delete AFTER DELETE ON matchmaking_team BEGIN
+        INSERT INTO matchmaking_team_search(matchmaking_team_search, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    'matchmaking_team_search_update': """CREATE TRIGGER matchmaking_team_search_update AFTER UPDATE OF name ON matchmaking_team
+    WHEN old.name IS NOT new.name BEGIN
+        INSERT INTO matchmaking_team_search(matchmaking_team_search, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO matchmaking_team_search(rowid, name) VALUES (new.id, new.name);
+    END""",
+}
+
+
+def terms(text):
+    return TERM.findall(text.lower())
+
+
+def match_expression(words, prefix=False):
+    """FTS5 MATCH expression requiring every word; the last one as a prefix if ``prefix``."""
+    quoted = [f'"{word}"' for word in words]
+    if prefix:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_teams(text, limit=20, prefix=False):
+    """Teams whose name contains every word of ``text``, best match first."""
+    words = terms(text)
+    if not words:
+        return []
+    connection = connections[router.db_for_read(Team)]
+    if connection.vendor != 'sqlite':
+        teams = Team.objects.all()
+        for word in words:
+            teams = teams.filter(name__icontains=word)
+        return list(teams.order_by('-score', 'id').values(*FIELDS)[:limit])
+
+    columns = ', '.join(f't.{field}' for field in FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {columns} FROM matchmaking_team_search s JOIN matchmaking_team t ON t.id = s.rowid "
+            f"WHERE matchmaking_team_search MATCH %s ORDER BY s.rank, t.score DESC, t.id LIMIT %s",
+            [match_expression(words, prefix), limit],
+        )
+        return [dict(zip(FIELDS, row)) for row in cursor.fetchall()]
+
+
+def ensure_search_index(using=DEFAULT_DB_ALIAS):
+    """Re-create missing sync triggers and rebuild the index; returns the names re-created.
+
+    Does nothing on other databases, or before migration 0012 has created
+    the search table.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+                       ['matchmaking_team_search', *TRIGGERS])
+        existing = {name for name, in cursor.fetchall()}
+        if 'matchmaking_team_search' not in existing:
+            return []
+        missing = [name for name in TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(TRIGGERS[name])
+        if missing:
+            # Renames, inserts and deletes made without the triggers.
+            cursor.execute("INSERT INTO matchmaking_team_search(matchmaking_team_search) VALUES ('rebuild')")
+    return missing
+
+
+class PrefixCache:
+    """LRU cache of autocomplete results, each kept for at most ``TEAM_SEARCH_CACHE_SECONDS``.
+
+    Cleared whenever a team is saved or deleted in this process; the time
+    limit bounds how stale it gets after writes made elsewhere (other
+    workers, ``bulk_create``, ``update()``).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, results = entry
+            if time.monotonic() - stored_at > getattr(settings, 'TEAM_SEARCH_CACHE_SECONDS', 30):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return results
+
+    def set(self, key, results):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > getattr(settings, 'TEAM_SEARCH_CACHE_SIZE', 1000):
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+prefix_cache = PrefixCache()
+
+
+def autocomplete(text, limit=10):
+    key = (' '.join(terms(text)), limit)
+    results = prefix_cache.get(key)
+    if results is None:
+        results = search_teams(text, limit, prefix=True)
+        prefix_cache.set(key, results)
+    return results
@@ -1,6 +1,6 @@
 
 from rest_framework import serializers
-from .models import Team, Match, Player, ScoreProposition, PlayerInvite, TeamRequest, User
+from .models import Team, Match, Player, ScoreProposition, PlayerInvite, TeamRequest, User, QueueTicket
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,16 +16,46 @@ class PlayerSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'team']
 
 
+class FreeAgentSerializer(serializers.ModelSerializer):
+    # Public listing: no contact details.
+    username = serializers.CharField(source='user.name', read_only=True)
+
+    class Meta:
+        model = Player
+        fields = ['id', 'username', 'team']
+
+
 class TeamSerializer(serializers.ModelSerializer):
     players = PlayerSerializer(many=True, read_only=True) 
     class Meta:
         model = Team
-        fields = ['id', 'name', 'is_public', 'score', 'players']
+        fields = ['id', 'name', 'is_public', 'score', 'rating', 'latitude', 'longitude', 'version', 'players']
+
+class OpponentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Team
+        fields = ['id', 'name', 'score', 'rating']
 
 class MatchSerializer(serializers.ModelSerializer):
     class Meta:
         model = Match
-        fields = ['id', 'status', 'created_at', 'expires_at', 'inviting_team', 'guest_team', 'inviting_score', 'guest_score']
+        fields = ['id', 'status', 'created_at', 'expires_at', 'inviting_team', 'guest_team', 'inviting_score', 'guest_score', 'version']
+
+class BulkMatchItemSerializer(serializers.Serializer):
+    inviting_team = serializers.IntegerField()
+    guest_team = serializers.IntegerField()
+    created_at = serializers.DateField(required=False)
+    expires_at = serializers.DateField(required=False, allow_null=True)
+
+    def validate(self, data):
+        if data['inviting_team'] == data['guest_team']:
+            raise serializers.ValidationError("A team cannot play against itself.")
+        return data
+
+class MatchEventItemSerializer(serializers.Serializer):
+    match = serializers.IntegerField()
+    event_type = serializers.CharField(max_length=100)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
 
 class ScorePropositionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -42,3 +72,8 @@ class TeamRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = TeamRequest
         fields = ['id', 'expire_date', 'player', 'team']
+
+class QueueTicketSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = QueueTicket
+        fields = ['id', 'team', 'status', 'opponent', 'created_at', 'matched_at']
@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from . import cache, live, search
+from .models import Match, MatchEvent, Player, Team, User
+
+
+def teams_changed(team_ids):
+    team_ids = {team_id for team_id in team_ids if team_id is not None}
+    if team_ids:
+        Team.objects.filter(id__in=team_ids).touch()
+        cache.invalidate_teams(team_ids)
+
+
+@receiver(post_save, sender=Team)
+def team_saved(sender, instance, created, **kwargs):
+    # The in-process prefix cache only follows committed data.
+    transaction.on_commit(search.prefix_cache.clear)
+    if created:
+        cache.invalidate_teams([instance.pk])
+    else:
+        teams_changed([instance.pk])
+
+
+@receiver(post_delete, sender=Team)
+def team_deleted(sender, instance, **kwargs):
+    transaction.on_commit(search.prefix_cache.clear)
+    cache.invalidate_teams([instance.pk])
+
+
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+def player_changed(sender, instance, **kwargs):
+    # Moving a player changes the roster of the team they leave as well.
+    teams_changed([instance.team_id, getattr(instance, '_loaded_team_id', None)])
+    instance._loaded_team_id = instance.team_id
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if not created:
+        teams_changed(instance.players.values_list('team_id', flat=True))
+
+
+@receiver(post_save, sender=Match)
+def match_saved(sender, instance, created, **kwargs):
+    if not created:
+        Match.objects.filter(pk=instance.pk).touch()
+    cache.invalidate_matches([instance.pk])
+
+
+@receiver(post_delete, sender=Match)
+def match_deleted(sender, instance, **kwargs):
+    cache.invalidate_matches([instance.pk])
+
+
+@receiver(post_save, sender=MatchEvent)
+def match_event_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: live.publish([instance]))
+
+
+@receiver(post_migrate)
+def search_index_migrated(sender, using, **kwargs):
+    if sender.name == 'matchmaking':
+        search.ensure_search_index(using)
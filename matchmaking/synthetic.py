@@ -0,0 +1,170 @@
+"""Deterministic synthetic league data for scale testing.
+
+``generate`` draws everything from one ``numpy`` generator seeded with
+``seed`` and dates everything from ``start_date`` rather than today, so the
+same arguments always produce the same league. Primary keys
+are assigned up front from ``MAX(id) + 1``, which lets propositions, matches
+and events reference each other without reading ids back after every
+``bulk_create``. The generator must therefore be the only writer while it
+runs. Matches are produced ``batch_size`` at a time, one transaction per
+batch, so memory stays flat however many are requested.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Max
+
+from . import cache, headtohead, ratings
+from .models import Match, MatchEvent, Player, ScoreProposition, Team, User
+
+FIRST_NAMES = ['An', 'Binh', 'Chi', 'Dung', 'Giang', 'Hai', 'Hoa', 'Hung', 'Khanh', 'Lan', 'Long', 'Mai', 'Minh',
+               'Nam', 'Ngoc', 'Phong', 'Quan', 'Son', 'Thanh', 'Trung', 'Tuan', 'Viet', 'Vy', 'Yen']
+SURNAMES = ['Nguyen', 'Tran', 'Le', 'Pham', 'Hoang', 'Huynh', 'Phan', 'Vu', 'Vo', 'Dang', 'Bui', 'Do', 'Ho', 'Ngo']
+TEAM_WORDS = ['United', 'City', 'Rovers', 'Stars', 'Dragons', 'Tigers', 'Eagles', 'Lions', 'Phoenix', 'Warriors']
+# (latitude, longitude) of the cities teams are spread around.
+CITIES = [(21.028, 105.834), (10.823, 106.630), (16.054, 108.202), (20.845, 106.688), (10.045, 105.746)]
+CARD_TYPES = ['Yellow card', 'Red card', 'Substitution']
+# First day of generated leagues unless ``generate`` is given another.
+START_DATE = date(2024, 1, 1)
+
+
+def _first_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def _teams(rng, count, batch_size):
+    first_id = _first_id(Team)
+    city = rng.integers(0, len(CITIES), count)
+    centres = np.array(CITIES)[city]
+    coordinates = centres + rng.normal(0, 0.05, (count, 2))
+    words = rng.integers(0, len(TEAM_WORDS), count)
+    public = rng.random(count) < 0.9
+    Team.objects.bulk_create([
+        Team(id=first_id + i, name=f"FC {TEAM_WORDS[words[i]]} {first_id + i}", is_public=bool(public[i]),
+             latitude=float(coordinates[i, 0]), longitude=float(coordinates[i, 1]))
+        for i in range(count)
+    ], batch_size=batch_size)
+    return np.arange(first_id, first_id + count)
+
+
+def _players(rng, count, team_ids, free_agent_share, batch_size):
+    first_id = _first_id(User)
+    first_names = rng.integers(0, len(FIRST_NAMES), count)
+    surnames = rng.integers(0, len(SURNAMES), count)
+    # Team sizes follow a Zipf-like skew: a few big clubs, many small ones.
+    weights = 1.0 / np.arange(1, len(team_ids) + 1) ** 0.5
+    teams = rng.choice(team_ids, count, p=weights / weights.sum())
+    free = rng.random(count) < free_agent_share
+
+    for start in range(0, count, batch_size):
+        stop = min(start + batch_size, count)
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(id=first_id + i, name=FIRST_NAMES[first_names[i]], surname=SURNAMES[surnames[i]],
+                     mail=f"user{first_id + i}@example.com")
+                for i in range(start, stop)
+            ])
+            Player.objects.bulk_create([
+                Player(user_id=first_id + i, team_id=None if free[i] else int(teams[i])) for i in range(start, stop)
+            ])
+
+
+def _match_batch(rng, size, team_ids, days, last_day, ids):
+    """Build one batch of propositions, matches and events; ``ids`` holds the next free ids."""
+    n_teams = len(team_ids)
+    inviting = rng.integers(0, n_teams, size)
+    guest = (inviting + rng.integers(1, n_teams, size)) % n_teams
+    age = rng.integers(0, days, size)
+    # Matches older than a week have been played; home sides score a little more.
+    played = age > 7
+    inviting_score = rng.poisson(1.5, size)
+    guest_score = rng.poisson(1.2, size)
+    # One in five upcoming matches already has the host's proposition.
+    proposed = ~played & (rng.random(size) < 0.2)
+    cards = rng.poisson(1.0, size)
+    card_types = rng.integers(0, len(CARD_TYPES), int(cards[played].sum()))
+
+    propositions, matches, events = [], [], []
+    card = 0
+    for i in range(size):
+        inviting_id, guest_id = int(team_ids[inviting[i]]), int(team_ids[guest[i]])
+        created_at = last_day - timedelta(days=int(age[i]))
+        match_id = ids['match']
+        ids['match'] += 1
+        host_id = guest_proposition_id = None
+        if played[i] or proposed[i]:
+            host_id = ids['proposition']
+            propositions.append(ScoreProposition(id=host_id, inviting_score=int(inviting_score[i]),
+                                                 guest_score=int(guest_score[i]), suggesting_team_id=inviting_id))
+            ids['proposition'] += 1
+        if played[i]:
+            guest_proposition_id = ids['proposition']
+            propositions.append(ScoreProposition(id=guest_proposition_id, inviting_score=int(inviting_score[i]),
+                                                 guest_score=int(guest_score[i]), suggesting_team_id=guest_id))
+            ids['proposition'] += 1
+            events.extend(MatchEvent(match_id=match_id, event_type='Goal', description=description)
+                          for description, goals in (('Home goal', inviting_score[i]), ('Away goal', guest_score[i]))
+                          for _ in range(int(goals)))
+            for _ in range(int(cards[i])):
+                events.append(MatchEvent(match_id=match_id, event_type=CARD_TYPES[card_types[card]]))
+                card += 1
+        matches.append(Match(
+            id=match_id, inviting_team_id=inviting_id, guest_team_id=guest_id,
+            status='COMPLETED' if played[i] else 'PENDING',
+            created_at=created_at,
+            expires_at=None if played[i] else created_at + timedelta(days=14),
+            suggested_at=created_at if host_id else None,
+            inviting_score=int(inviting_score[i]) if played[i] else None,
+            guest_score=int(guest_score[i]) if played[i] else None,
+            host_proposition_id=host_id, guest_proposition_id=guest_proposition_id,
+        ))
+
+    scores = (np.bincount(inviting[played], weights=inviting_score[played], minlength=n_teams) +
+              np.bincount(guest[played], weights=guest_score[played], minlength=n_teams))
+    return propositions, matches, events, scores
+
+
+def generate(teams=1000, players=20000, matches=100000, seed=0, days=730, free_agent_share=0.1,
+             batch_size=5000, with_ratings=True, progress=None, start_date=START_DATE):
+    """Create a synthetic league and return the number of rows created per model.
+
+    Matches are spread over the ``days`` days from ``start_date`` on.
+    ``progress``, if given, is called with ``(matches_done, matches)`` after
+    every batch of matches.
+    """
+    if teams < 2:
+        raise ValueError("A league needs at least two teams.")
+    rng = np.random.default_rng(seed)
+    last_day = start_date + timedelta(days=days - 1)
+
+    team_ids = _teams(rng, teams, batch_size)
+    _players(rng, players, team_ids, free_agent_share, batch_size)
+
+    ids = {'match': _first_id(Match), 'proposition': _first_id(ScoreProposition)}
+    scores = np.zeros(teams)
+    created = {'teams': teams, 'players': players, 'matches': 0, 'propositions': 0, 'events': 0}
+    for start in range(0, matches, batch_size):
+        size = min(batch_size, matches - start)
+        propositions, match_objs, events, batch_scores = _match_batch(rng, size, team_ids, days, last_day, ids)
+        with transaction.atomic():
+            ScoreProposition.objects.bulk_create(propositions, batch_size=batch_size)
+            Match.objects.bulk_create(match_objs, batch_size=batch_size)
+            MatchEvent.objects.bulk_create(events, batch_size=batch_size)
+        scores += batch_scores
+        created['matches'] += len(match_objs)
+        created['propositions'] += len(propositions)
+        created['events'] += len(events)
+        if progress is not None:
+            progress(created['matches'], matches)
+
+    Team.objects.bulk_update(
+        [Team(id=int(team_id), score=int(score), version=F('version') + 1) for team_id, score in zip(team_ids, scores)],
+        ['score', 'version'],
+        batch_size=batch_size,
+    )
+    if with_ratings:
+        ratings.rebuild_ratings(batch_size=batch_size)
+    headtohead.rebuild(batch_size=batch_size)
+    cache.clear()
+    return created
@@ -1,10 +1,36 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from datetime import date, datetime, timezone
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F, Max, Min
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
-from .models import PlayerInvite, Team, Match, Player, TeamRequest, User
+from . import benchmarks, cache as response_cache, search as team_search
+from .db import ReadReplicaRouter
+from .expiry import sweep
+from .geo import haversine_km
+from .ingest import event_buffer
+from .live import MatchFeed, Subscriber, _poll, event_payload, feeds as live_feeds, live_feed_application
+from .matcher import pair_by_rating, run_matching_pass
+from .metrics import metrics as request_metrics
+from .ratings import compute_elo
+from .serializers import TeamSerializer
+from .synthetic import generate
+from .views import _detail_state
+from .models import HeadToHead, MatchEvent, PlayerInvite, QueueTicket, ScoreProposition, Team, Match, Player, TeamRequest, User
 
-from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
 from .models import Team, Player, Match, PlayerInvite, TeamRequest, User
@@ -13,6 +39,7 @@ from .models import Team, Player, Match, PlayerInvite, TeamRequest, User
 class TeamDetailViewTests(TestCase):
     def setUp(self):
         self.client = APIClient()
+        response_cache.clear()
         self.team = Team.objects.create(name="Test Team", is_public=True)
 
     def test_get_team_detail_success(self):
@@ -50,6 +77,7 @@ class TeamChallengeAPIViewTests(TestCase):
 class MatchDetailAPIViewTests(TestCase):
     def setUp(self):
         self.client = APIClient()
+        response_cache.clear()
         self.inviting_team = Team.objects.create(name="Inviting Team", is_public=True)
         self.guest_team = Team.objects.create(name="Guest Team", is_public=True)
         self.match = Match.objects.create(
@@ -176,3 +204,1304 @@ class AcceptTeamRequestAPIViewTests(TestCase):
         response = self.client.post('/api/team_requests/999/accept/')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertIn('Request not found', response.data.get('error', ''))
+
+
+class TeamListViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(5):
+            team = Team.objects.create(name=f"Team {i}", is_public=i % 2 == 0, score=i * 10)
+            for j in range(3):
+                user = User.objects.create(name=f'P{i}{j}', surname='Doe', mail=f'p{i}{j}@example.com')
+                Player.objects.create(user=user, team=team)
+
+    def test_list_teams_paginated(self):
+        response = self.client.get('/api/teams/', {'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['name'] for t in response.data['results']], ['Team 0', 'Team 1'])
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([t['name'] for t in response.data['results']], ['Team 2', 'Team 3'])
+
+    def test_list_teams_fixed_query_count(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/teams/', {'limit': 5})
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(len(response.data['results'][0]['players']), 3)
+
+    def test_list_teams_filters(self):
+        response = self.client.get('/api/teams/', {'is_public': 'true', 'min_score': 10, 'max_score': 40})
+        self.assertEqual([t['name'] for t in response.data['results']], ['Team 2', 'Team 4'])
+
+    def test_list_teams_invalid_filter(self):
+        response = self.client.get('/api/teams/', {'min_score': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MatchScorePropositionAPIViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.inviting_team = Team.objects.create(name="Inviting Team", is_public=True)
+        self.guest_team = Team.objects.create(name="Guest Team", is_public=True)
+        self.match = Match.objects.create(
+            inviting_team=self.inviting_team,
+            guest_team=self.guest_team,
+            status='PENDING'
+        )
+
+    def propose(self, team, my_score, opponent_score):
+        return self.client.post(f'/api/matches/{self.match.id}/score-proposition/', {
+            'my_team_id': team.id,
+            'my_score': my_score,
+            'opponent_score': opponent_score
+        }, format='json')
+
+    def test_agreed_score_updates_team_scores(self):
+        self.propose(self.inviting_team, 3, 1)
+        self.inviting_team.refresh_from_db()
+        self.assertEqual(self.inviting_team.score, 0)
+
+        response = self.propose(self.guest_team, 1, 3)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.inviting_team.refresh_from_db()
+        self.guest_team.refresh_from_db()
+        self.assertEqual(self.inviting_team.score, 3)
+        self.assertEqual(self.guest_team.score, 1)
+
+    def test_corrected_score_applies_delta(self):
+        self.propose(self.inviting_team, 3, 1)
+        self.propose(self.guest_team, 1, 3)
+        self.propose(self.inviting_team, 2, 2)
+        self.propose(self.guest_team, 2, 2)
+        self.inviting_team.refresh_from_db()
+        self.guest_team.refresh_from_db()
+        self.assertEqual(self.inviting_team.score, 2)
+        self.assertEqual(self.guest_team.score, 2)
+
+    def test_query_budget(self):
+        with self.assertNumQueries(5):
+            self.propose(self.inviting_team, 3, 1)
+        # Savepoint, locked load, proposition, match, both teams in one UPDATE,
+        # head-to-head insert and update, release.
+        with self.assertNumQueries(8):
+            self.propose(self.guest_team, 1, 3)
+
+    def test_rejects_team_outside_match(self):
+        other = Team.objects.create(name="Other")
+        self.assertEqual(self.propose(other, 1, 0).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(f'/api/matches/{self.match.id}/score-proposition/', {
+            'my_team_id': self.inviting_team.id, 'my_score': 'x', 'opponent_score': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejects_negative_scores(self):
+        self.propose(self.inviting_team, 1, 0)
+        response = self.propose(self.guest_team, -1, 0)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], "Scores cannot be negative.")
+        self.match.refresh_from_db()
+        self.assertIsNone(self.match.guest_proposition_id)
+        self.assertIsNone(self.match.inviting_score)
+
+    def test_unknown_match(self):
+        response = self.client.post('/api/matches/999/score-proposition/', {
+            'my_team_id': self.inviting_team.id, 'my_score': 1, 'opponent_score': 0}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConcurrentScorePropositionTests(TransactionTestCase):
+    # Includes the read replica when run with the production settings.
+    databases = '__all__'
+
+    def test_both_teams_at_once(self):
+        home = Team.objects.create(name="Home")
+        away = Team.objects.create(name="Away")
+        matches = [Match.objects.create(inviting_team=home, guest_team=away) for _ in range(10)]
+        barrier = threading.Barrier(2)
+        errors = []
+
+        def submit(team, my_score, opponent_score):
+            client = APIClient()
+            try:
+                for match in matches:
+                    barrier.wait()
+                    response = client.post(f'/api/matches/{match.id}/score-proposition/', {
+                        'my_team_id': team.id, 'my_score': my_score, 'opponent_score': opponent_score}, format='json')
+                    if response.status_code != status.HTTP_200_OK:
+                        errors.append(response.status_code)
+            except Exception as exc:
+                errors.append(exc)
+                barrier.abort()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit, args=(home, 2, 1)),
+                   threading.Thread(target=submit, args=(away, 1, 2))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(ScoreProposition.objects.count(), 20)
+        self.assertEqual(Match.objects.filter(inviting_score=2, guest_score=1).count(), 10)
+        home.refresh_from_db()
+        away.refresh_from_db()
+        self.assertEqual((home.score, away.score), (20, 10))
+        self.assertAlmostEqual(home.rating + away.rating, 3000.0)
+        self.assertGreater(home.rating, 1500.0)
+
+
+class RebuildScoresCommandTests(TestCase):
+    def test_rebuild_scores(self):
+        team_a = Team.objects.create(name="A", score=99)
+        team_b = Team.objects.create(name="B", score=99)
+        Match.objects.create(inviting_team=team_a, guest_team=team_b, inviting_score=2, guest_score=1)
+        Match.objects.create(inviting_team=team_b, guest_team=team_a, inviting_score=4, guest_score=0)
+        Match.objects.create(inviting_team=team_b, guest_team=team_a)
+
+        call_command('rebuild_scores', batch_size=1, stdout=StringIO())
+
+        team_a.refresh_from_db()
+        team_b.refresh_from_db()
+        self.assertEqual(team_a.score, 2)
+        self.assertEqual(team_b.score, 5)
+
+
+class LeaderboardAPIViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teams = [Team.objects.create(name=f"Team {score}", score=score) for score in (10, 30, 20, 30, 5)]
+
+    def test_top(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/leaderboard/', {'limit': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 5)
+        self.assertEqual([(t['name'], t['rank']) for t in response.data['results']],
+                         [('Team 30', 1), ('Team 30', 1), ('Team 20', 3)])
+
+    def test_rank_and_neighbours(self):
+        # Score, both sides of the team, the first neighbour's position and the total.
+        with self.assertNumQueries(5):
+            response = self.client.get(f'/api/teams/{self.teams[0].id}/rank/', {'radius': 1})
+        self.assertEqual(response.data['rank'], 4)
+        self.assertEqual([t['score'] for t in response.data['around']], [20, 10, 5])
+
+        # The window starts inside a tie.
+        response = self.client.get(f'/api/teams/{self.teams[2].id}/rank/', {'radius': 1})
+        self.assertEqual([(t['id'], t['rank']) for t in response.data['around']],
+                         [(self.teams[3].id, 1), (self.teams[2].id, 3), (self.teams[0].id, 4)])
+
+    def test_rank_follows_score_changes(self):
+        self.teams[4].add_score(100)
+        response = self.client.get(f'/api/teams/{self.teams[4].id}/rank/')
+        self.assertEqual(response.data['rank'], 1)
+
+        new_team = Team.objects.create(name="Newcomer", score=25)
+        response = self.client.get(f'/api/teams/{new_team.id}/rank/')
+        self.assertEqual(response.data['rank'], 4)
+
+        self.teams[4].delete()
+        response = self.client.get(f'/api/teams/{self.teams[0].id}/rank/')
+        self.assertEqual(response.data['rank'], 5)
+
+    def test_rolled_back_score_leaves_rank_alone(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.teams[4].add_score(100)
+            raise IntegrityError
+        response = self.client.get(f'/api/teams/{self.teams[4].id}/rank/')
+        self.assertEqual(response.data['rank'], 5)
+
+    def test_rank_team_not_found(self):
+        response = self.client.get('/api/teams/999/rank/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rejects_out_of_range_parameters(self):
+        for params in ({'limit': 0}, {'limit': -1}, {'limit': 'x'}):
+            self.assertEqual(self.client.get('/api/leaderboard/', params).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f'/api/teams/{self.teams[0].id}/rank/', {'radius': -1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f'/api/teams/{self.teams[0].id}/rank/', {'radius': 0})
+        self.assertEqual([t['id'] for t in response.data['around']], [self.teams[0].id])
+
+
+class RatingEngineTests(TestCase):
+    def sequential_elo(self, history, n_teams, k=32.0):
+        ratings = [1500.0] * n_teams
+        for a, b, sa, sb in history:
+            outcome = 1.0 if sa > sb else 0.5 if sa == sb else 0.0
+            delta = k * (outcome - 1.0 / (1.0 + 10 ** ((ratings[b] - ratings[a]) / 400.0)))
+            ratings[a] += delta
+            ratings[b] -= delta
+        return ratings
+
+    def test_vectorized_replay_matches_sequential(self):
+        rng = np.random.default_rng(42)
+        inviting = rng.integers(0, 20, 500)
+        guest = (inviting + rng.integers(1, 20, 500)) % 20
+        scores = rng.integers(0, 5, (500, 2))
+        history = list(zip(inviting.tolist(), guest.tolist(), scores[:, 0].tolist(), scores[:, 1].tolist()))
+
+        ratings = compute_elo(inviting, guest, scores[:, 0], scores[:, 1], 20, k=32.0, initial=1500.0)
+        np.testing.assert_allclose(ratings, self.sequential_elo(history, 20))
+
+    def test_agreed_score_updates_ratings(self):
+        team_a = Team.objects.create(name="A")
+        team_b = Team.objects.create(name="B")
+        match = Match.objects.create(inviting_team=team_a, guest_team=team_b)
+        match.update_proposition(team_a, 2, 0)
+        match.update_proposition(team_b, 0, 2)
+
+        team_a.refresh_from_db()
+        team_b.refresh_from_db()
+        self.assertAlmostEqual(team_a.rating, 1516.0)
+        self.assertAlmostEqual(team_b.rating, 1484.0)
+
+    def test_corrected_score_replaces_rating_change(self):
+        team_a = Team.objects.create(name="A")
+        team_b = Team.objects.create(name="B")
+        match = Match.objects.create(inviting_team=team_a, guest_team=team_b)
+        match.update_proposition(team_a, 2, 0)
+        match.update_proposition(team_b, 0, 2)
+        match.update_proposition(team_a, 0, 2)
+        match.update_proposition(team_b, 2, 0)
+
+        team_a.refresh_from_db()
+        team_b.refresh_from_db()
+        self.assertAlmostEqual(team_a.rating, 1484.0)
+        self.assertAlmostEqual(team_b.rating, 1516.0)
+        self.assertAlmostEqual(match.rating_delta, -16.0)
+
+        # Same ratings as replaying the corrected history.
+        call_command('rebuild_ratings', stdout=StringIO())
+        team_a.refresh_from_db()
+        self.assertAlmostEqual(team_a.rating, 1484.0)
+
+    @override_settings(RATING_INITIAL=1200.0)
+    def test_initial_rating_setting(self):
+        self.assertEqual(Team.objects.create(name="New").rating, 1200.0)
+
+    def test_rebuild_ratings_command(self):
+        team_a = Team.objects.create(name="A", rating=1000)
+        team_b = Team.objects.create(name="B", rating=1000)
+        Match.objects.create(inviting_team=team_a, guest_team=team_b, inviting_score=1, guest_score=1)
+        won = Match.objects.create(inviting_team=team_b, guest_team=team_a, inviting_score=3, guest_score=0)
+        Match.objects.create(inviting_team=team_b, guest_team=team_a)
+
+        call_command('rebuild_ratings', stdout=StringIO())
+
+        team_a.refresh_from_db()
+        team_b.refresh_from_db()
+        self.assertAlmostEqual(team_a.rating, 1484.0)
+        self.assertAlmostEqual(team_b.rating, 1516.0)
+        won.refresh_from_db()
+        self.assertAlmostEqual(won.rating_delta, 16.0)
+
+        # A correction after the rebuild starts from the replayed change.
+        call_command('rebuild_head_to_head', stdout=StringIO())
+        Match.propose_score(won.id, team_b.id, 0, 3)
+        Match.propose_score(won.id, team_a.id, 3, 0)
+        team_a.refresh_from_db()
+        self.assertAlmostEqual(team_a.rating, 1516.0)
+
+
+class TeamOpponentsAPIViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.team = Team.objects.create(name="Me", rating=1500)
+        self.near = Team.objects.create(name="Near", rating=1510)
+        self.below = Team.objects.create(name="Below", rating=1480)
+        self.far = Team.objects.create(name="Far", rating=1900)
+        self.private = Team.objects.create(name="Private", rating=1500, is_public=False)
+        self.pending = Team.objects.create(name="Pending", rating=1501)
+        Match.objects.create(inviting_team=self.pending, guest_team=self.team, status='PENDING')
+
+    def test_suggest_opponents(self):
+        response = self.client.get(f'/api/teams/{self.team.id}/opponents/', {'k': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['name'] for t in response.data], ['Near', 'Below'])
+
+    def test_suggest_opponents_by_score(self):
+        Team.objects.filter(id=self.far.id).update(score=1)
+        response = self.client.get(f'/api/teams/{self.team.id}/opponents/', {'k': 1, 'by': 'score'})
+        self.assertEqual([t['name'] for t in response.data], ['Near'])
+
+    def test_suggest_opponents_team_not_found(self):
+        response = self.client.get('/api/teams/999/opponents/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rejects_k_below_one(self):
+        for k in (0, -1):
+            response = self.client.get(f'/api/teams/{self.team.id}/opponents/', {'k': k})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MatchmakingQueueTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teams = [Team.objects.create(name=f"Team {rating}", rating=rating) for rating in (1500, 1210, 1490, 1200, 1800)]
+
+    def test_pair_by_rating_is_optimal(self):
+        ratings = [1500, 1210, 1490, 1200, 1800]
+        pairs = pair_by_rating(ratings)
+        self.assertEqual({frozenset(pair) for pair in pairs}, {frozenset((1, 3)), frozenset((0, 2))})
+
+        rng = np.random.default_rng(1)
+        for _ in range(20):
+            ratings = rng.normal(1500, 200, 7)
+            cost = sum(abs(ratings[i] - ratings[j]) for i, j in pair_by_rating(ratings))
+            best = min(
+                sum(abs(a - b) for a, b in zip(kept[0::2], kept[1::2]))
+                for kept in (np.delete(np.sort(ratings), skip) for skip in range(7))
+            )
+            self.assertAlmostEqual(cost, best)
+
+    def test_queue_and_match(self):
+        for team in self.teams:
+            response = self.client.post(f'/api/teams/{team.id}/queue/')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(f'/api/teams/{self.teams[0].id}/queue/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(run_matching_pass(), 2)
+        self.assertEqual(Match.objects.filter(status='PENDING').count(), 2)
+        self.assertTrue(Match.objects.filter(inviting_team=self.teams[1], guest_team=self.teams[3]).exists())
+
+        response = self.client.get(f'/api/teams/{self.teams[0].id}/queue/')
+        self.assertEqual(response.data['status'], 'MATCHED')
+        self.assertEqual(response.data['opponent'], self.teams[2].id)
+        response = self.client.get(f'/api/teams/{self.teams[4].id}/queue/')
+        self.assertEqual(response.data['status'], 'WAITING')
+
+    def test_ticket_cancelled_during_pass_is_not_matched(self):
+        tickets = [QueueTicket.objects.create(team=team) for team in self.teams[:4]]
+
+        def cancel_first(ratings):
+            QueueTicket.objects.filter(id=tickets[0].id).update(status='CANCELLED')
+            return pair_by_rating(ratings)
+
+        with mock.patch('matchmaking.matcher.pair_by_rating', side_effect=cancel_first):
+            self.assertEqual(run_matching_pass(), 1)
+
+        statuses = dict(QueueTicket.objects.values_list('team_id', 'status'))
+        # Team 1490 was paired with the cancelled Team 1500 and goes back to the queue.
+        self.assertEqual(statuses, {self.teams[0].id: 'CANCELLED', self.teams[1].id: 'MATCHED',
+                                    self.teams[2].id: 'WAITING', self.teams[3].id: 'MATCHED'})
+        self.assertFalse(Match.objects.filter(inviting_team=self.teams[0]).exists())
+
+    def test_concurrent_join_returns_conflict(self):
+        # The existence check passed, but another request created the ticket first.
+        with mock.patch('matchmaking.views.QueueTicket.objects.filter') as queued:
+            queued.return_value.exists.return_value = False
+            QueueTicket.objects.create(team=self.teams[0])
+            response = self.client.post(f'/api/teams/{self.teams[0].id}/queue/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_leave_queue(self):
+        self.client.post(f'/api/teams/{self.teams[0].id}/queue/')
+        response = self.client.delete(f'/api/teams/{self.teams[0].id}/queue/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.delete(f'/api/teams/{self.teams[0].id}/queue/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class NearbyTeamsAPIViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        # Hanoi, about 2 km, about 20 km and about 1140 km (Ho Chi Minh City) away.
+        self.home = Team.objects.create(name="Home", latitude=21.0285, longitude=105.8542)
+        self.close = Team.objects.create(name="Close", latitude=21.0450, longitude=105.8600)
+        self.suburb = Team.objects.create(name="Suburb", latitude=21.2000, longitude=105.8000)
+        self.far = Team.objects.create(name="Far", latitude=10.7769, longitude=106.7009)
+        Team.objects.create(name="Private", latitude=21.0290, longitude=105.8540, is_public=False)
+        Team.objects.create(name="Nowhere")
+
+    def test_teams_within_radius(self):
+        response = self.client.get('/api/teams/nearby/', {'lat': 21.0285, 'lon': 105.8542, 'km': 25})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['name'] for t in response.data], ['Home', 'Close', 'Suburb'])
+        self.assertLess(response.data[1]['distance_km'], 3)
+
+    @override_settings(NEAREST_TEAMS_MAX_KM=2000)
+    def test_nearest_opponents(self):
+        response = self.client.get(f'/api/teams/{self.home.id}/nearest/', {'k': 3})
+        self.assertEqual([t['name'] for t in response.data['results']], ['Close', 'Suburb', 'Far'])
+        self.assertAlmostEqual(response.data['results'][2]['distance_km'],
+                               haversine_km(21.0285, 105.8542, 10.7769, 106.7009), places=2)
+
+    @override_settings(NEAREST_TEAMS_MAX_KM=2000)
+    def test_nearest_stops_once_every_team_is_found(self):
+        # Team lookup, radii 5 to 1280 km (which reaches Far), and one COUNT
+        # instead of going on to the 2000 km limit.
+        with self.assertNumQueries(11):
+            response = self.client.get(f'/api/teams/{self.home.id}/nearest/', {'k': 10})
+        self.assertEqual([t['name'] for t in response.data['results']], ['Close', 'Suburb', 'Far'])
+        self.assertEqual(response.data['searched_km'], 1280)
+
+    @override_settings(NEAREST_TEAMS_MAX_KM=500)
+    def test_nearest_search_is_capped(self):
+        # Team lookup, radii 5 to 320 km, one COUNT and the final 500 km.
+        with self.assertNumQueries(10):
+            response = self.client.get(f'/api/teams/{self.home.id}/nearest/', {'k': 3})
+        self.assertEqual([t['name'] for t in response.data['results']], ['Close', 'Suburb'])
+        self.assertEqual(response.data['searched_km'], 500)
+
+    def test_nearest_rejects_k_below_one(self):
+        response = self.client.get(f'/api/teams/{self.home.id}/nearest/', {'k': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_nearby_requires_coordinates(self):
+        response = self.client.get('/api/teams/nearby/', {'lat': 21})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_nearby_rejects_out_of_range_values(self):
+        for params in ({'km': 'nan'}, {'km': 'inf'}, {'km': 0}, {'km': -5},
+                       {'lat': 91}, {'lat': 'nan'}, {'lon': -181}, {'lon': 'inf'}):
+            query = {'lat': 21.0285, 'lon': 105.8542, **params}
+            response = self.client.get('/api/teams/nearby/', query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class TeamMatchHistoryAPIViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.team = Team.objects.create(name="Me")
+        self.other = Team.objects.create(name="Other")
+        self.third = Team.objects.create(name="Third")
+        self.matches = [
+            Match.objects.create(inviting_team=self.team, guest_team=self.other, created_at='2024-12-01', inviting_score=1, guest_score=0, status='COMPLETED'),
+            Match.objects.create(inviting_team=self.other, guest_team=self.team, created_at='2024-12-02', inviting_score=2, guest_score=2, status='COMPLETED'),
+            Match.objects.create(inviting_team=self.team, guest_team=self.third, created_at='2024-12-02'),
+            Match.objects.create(inviting_team=self.third, guest_team=self.team, created_at='2024-12-05'),
+            Match.objects.create(inviting_team=self.other, guest_team=self.third, created_at='2024-12-03'),
+        ]
+
+    def ids(self, response):
+        return [m['id'] for m in response.data['results']]
+
+    def test_history_ordered_and_paginated(self):
+        response = self.client.get(f'/api/teams/{self.team.id}/matches/', {'limit': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ids(response), [self.matches[3].id, self.matches[2].id, self.matches[1].id])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(self.ids(response), [self.matches[0].id])
+        self.assertIsNone(response.data['next'])
+
+    def test_history_filters(self):
+        response = self.client.get(f'/api/teams/{self.team.id}/matches/', {'state': 'played'})
+        self.assertEqual(self.ids(response), [self.matches[1].id, self.matches[0].id])
+
+        response = self.client.get(f'/api/teams/{self.team.id}/matches/', {'state': 'planned', 'date_to': '2024-12-04'})
+        self.assertEqual(self.ids(response), [self.matches[2].id])
+
+        response = self.client.get(f'/api/teams/{self.team.id}/matches/', {'status': 'COMPLETED', 'date_from': '2024-12-02'})
+        self.assertEqual(self.ids(response), [self.matches[1].id])
+
+    def test_history_single_query_per_page(self):
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/teams/{self.team.id}/matches/')
+
+    def test_history_invalid_cursor(self):
+        response = self.client.get(f'/api/teams/{self.team.id}/matches/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_history_rejects_limit_below_one(self):
+        for limit in (0, -1):
+            response = self.client.get(f'/api/teams/{self.team.id}/matches/', {'limit': limit})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkCreateMatchAPIViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teams = [Team.objects.create(name=f"Team {i}") for i in range(4)]
+
+    def test_bulk_create_with_partial_failure(self):
+        a, b, c, d = (team.id for team in self.teams)
+        # Team lookup, then savepoint, MAX(id), one INSERT, new ids, release.
+        with self.assertNumQueries(6):
+            response = self.client.post('/api/matches/bulk/', {'matches': [
+                {'inviting_team': a, 'guest_team': b, 'created_at': '2024-12-22'},
+                {'inviting_team': c, 'guest_team': 999},
+                {'inviting_team': c, 'guest_team': c},
+                {'inviting_team': c, 'guest_team': d, 'expires_at': '2024-12-30'},
+                {'inviting_team': 'x', 'guest_team': d},
+            ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([r['status'] for r in response.data['results']],
+                         ['created', 'error', 'error', 'created', 'error'])
+        ids = [r['id'] for r in response.data['results'] if r['status'] == 'created']
+        self.assertEqual(set(Match.objects.values_list('id', flat=True)), set(ids))
+        created = Match.objects.get(id=ids[0])
+        self.assertEqual((created.inviting_team_id, created.guest_team_id), (a, b))
+        self.assertEqual(str(created.created_at), '2024-12-22')
+        self.assertTrue(Match.objects.filter(inviting_team_id=c, guest_team_id=d, expires_at='2024-12-30').exists())
+
+    def test_bulk_create_rejects_empty_payload(self):
+        response = self.client.post('/api/matches/bulk/', {'matches': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/matches/bulk/', [{'inviting_team': 1, 'guest_team': 2}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportPlayersTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.team = Team.objects.create(name="Club")
+
+    def test_import_csv_upload(self):
+        content = (
+            "name,surname,mail,team\n"
+            f"Ann,Lee,ann@example.com,{self.team.id}\n"
+            "Bob,Ng,bob@example.com,\n"
+            "Cat,,cat@example.com,\n"
+            "Dan,Vo,dan@example.com,999\n"
+        )
+        upload = SimpleUploadedFile('players.csv', content.encode())
+        response = self.client.post('/api/players/import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        # File lines, counting the header.
+        self.assertEqual([e['row'] for e in response.data['errors']], [4, 5])
+        self.assertEqual(Player.objects.get(user__name='Ann').team, self.team)
+        self.assertIsNone(Player.objects.get(user__name='Bob').team)
+
+    def test_import_jsonl_command_in_batches(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            for i in range(7):
+                handle.write(json.dumps({'name': f'P{i}', 'surname': 'S', 'mail': f'p{i}@example.com', 'team': self.team.id}) + '\n')
+            handle.write('\nnot json\n')
+        self.addCleanup(os.remove, handle.name)
+
+        errors = StringIO()
+        call_command('import_players', handle.name, batch_size=3, stdout=StringIO(), stderr=errors)
+
+        self.assertEqual(self.team.players.count(), 7)
+        self.assertEqual(sorted(p.user.name for p in self.team.players.all()), [f'P{i}' for i in range(7)])
+        # Blank lines still count towards the reported line.
+        self.assertIn("Row 9: Row is not an object.", errors.getvalue())
+
+    def test_import_command_reports_unreadable_files(self):
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as handle:
+            handle.write(b'name,surname,mail\n\xff\xfe,Lee,ann@example.com\n')
+        self.addCleanup(os.remove, handle.name)
+
+        with self.assertRaisesMessage(CommandError, "Could not parse"):
+            call_command('import_players', handle.name, stdout=StringIO(), stderr=StringIO())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        team_a = Team.objects.create(name="A")
+        team_b = Team.objects.create(name="B")
+        self.old = Match.objects.create(inviting_team=team_a, guest_team=team_b, created_at='2024-11-01')
+        self.new = Match.objects.create(inviting_team=team_b, guest_team=team_a, created_at='2024-12-20', inviting_score=1, guest_score=0)
+        MatchEvent.objects.create(match=self.new, event_type='Goal', description='Header, 12th minute')
+
+    def export_ids(self, dataset, since):
+        response = self.client.get(f'/api/export/{dataset}.ndjson', {'since': since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        return [row['id'] for row in rows], rows
+
+    def test_export_ndjson_since(self):
+        Match.objects.filter(id=self.old.id).update(updated_at=datetime(2024, 11, 1, tzinfo=timezone.utc))
+        Match.objects.filter(id=self.new.id).update(updated_at=datetime(2024, 12, 20, tzinfo=timezone.utc))
+        ids, rows = self.export_ids('matches', '2024-12-01')
+        self.assertEqual(ids, [self.new.id])
+        self.assertEqual(rows[0]['created_at'], '2024-12-20')
+
+        # A score agreed later is picked up by the next incremental pull.
+        Match.propose_score(self.old.id, self.old.inviting_team_id, 2, 2)
+        self.assertEqual(self.export_ids('matches', '2024-12-01')[0], [self.old.id, self.new.id])
+        proposition_ids, _ = self.export_ids('propositions', '2024-12-01')
+        self.assertEqual(len(proposition_ids), 1)
+
+    def test_export_csv(self):
+        response = self.client.get('/api/export/events.csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,match_id,timestamp,event_type,description')
+        self.assertIn('Goal,"Header, 12th minute"', lines[1])
+
+    def test_export_unknown_dataset(self):
+        response = self.client.get('/api/export/players.csv')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_data', 'matches', '--format', 'csv', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+
+class SweepExpiredTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(name='Jane', surname='Doe', mail='jane.doe@example.com')
+        self.player = Player.objects.create(user=user)
+        self.team = Team.objects.create(name="Team")
+        self.other = Team.objects.create(name="Other")
+
+    def test_sweep_in_batches(self):
+        for _ in range(5):
+            PlayerInvite.objects.create(player=self.player, team=self.team, expire_date='2024-12-01')
+        fresh_invite = PlayerInvite.objects.create(player=self.player, team=self.team, expire_date='2025-01-01')
+        old_request = TeamRequest.objects.create(player=self.player, team=self.team, expire_date='2024-12-01')
+        accepted = TeamRequest.objects.create(player=self.player, team=self.team, expire_date='2024-12-01', status='ACCEPTED')
+        old_match = Match.objects.create(inviting_team=self.team, guest_team=self.other, expires_at='2024-12-01')
+        played = Match.objects.create(inviting_team=self.team, guest_team=self.other, expires_at='2024-12-01', inviting_score=1, guest_score=1)
+
+        processed = sweep(batch_size=2, today=date(2024, 12, 15))
+
+        self.assertEqual(processed, {'player_invites': 5, 'team_requests': 1, 'matches': 1})
+        self.assertEqual(list(PlayerInvite.objects.values_list('id', flat=True)), [fresh_invite.id])
+        self.assertEqual(TeamRequest.objects.get(id=old_request.id).status, 'EXPIRED')
+        self.assertEqual(TeamRequest.objects.get(id=accepted.id).status, 'ACCEPTED')
+        self.assertEqual(Match.objects.get(id=old_match.id).status, 'EXPIRED')
+        self.assertEqual(Match.objects.get(id=played.id).status, 'PENDING')
+
+    def test_sweep_command_reports_counts(self):
+        out = StringIO()
+        call_command('sweep_expired', stdout=out)
+        self.assertIn('player_invites: 0', out.getvalue())
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        response_cache.clear()
+        self.team = Team.objects.create(name="Cached")
+        self.other = Team.objects.create(name="Other")
+        user = User.objects.create(name='Jane', surname='Doe', mail='jane.doe@example.com')
+        self.player = Player.objects.create(user=user, team=self.team)
+        self.match = Match.objects.create(inviting_team=self.team, guest_team=self.other)
+
+    def test_team_detail_served_from_cache(self):
+        self.client.get(f'/api/teams/{self.team.id}/')
+        before = response_cache.stats.snapshot()
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/teams/{self.team.id}/')
+        self.assertEqual(response.data['name'], "Cached")
+        self.assertEqual(response_cache.stats.snapshot()['hits'], before['hits'] + 1)
+
+    def test_team_edit_and_roster_change_invalidate(self):
+        self.client.get(f'/api/teams/{self.team.id}/')
+        self.client.get(f'/api/teams/{self.other.id}/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.name = "Renamed"
+            self.team.save()
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.id}/').data['name'], "Renamed")
+
+        # The player's UPDATE and one version bump of both teams; the team the
+        # player leaves is known from when it was loaded.
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(2):
+            self.player.team = self.other
+            self.player.save()
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.id}/').data['players'], [])
+        self.assertEqual(len(self.client.get(f'/api/teams/{self.other.id}/').data['players']), 1)
+
+    def test_invalidation_waits_for_commit(self):
+        self.client.get(f'/api/teams/{self.team.id}/')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.team.name = "Renamed"
+            self.team.save()
+            self.assertEqual(self.client.get(f'/api/teams/{self.team.id}/').data['name'], "Cached")
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.id}/').data['name'], "Renamed")
+
+    def test_score_proposition_invalidates_match_and_teams(self):
+        self.client.get(f'/api/matches/{self.match.id}/')
+        self.client.get(f'/api/teams/{self.team.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.match.update_proposition(self.team, 2, 1)
+            self.match.update_proposition(self.other, 1, 2)
+
+        self.assertEqual(self.client.get(f'/api/matches/{self.match.id}/').data['inviting_score'], 2)
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.id}/').data['score'], 2)
+
+    def test_fill_racing_a_write_is_not_kept(self):
+        key = response_cache.team_key(self.team.id)
+
+        def build():
+            payload = TeamSerializer(Team.objects.get(id=self.team.id)).data
+            # A write commits (and invalidates) after the payload was built.
+            Team.objects.filter(id=self.team.id).touch(name="Renamed")
+            return payload
+
+        code, payload, _ = _detail_state(set(), key, Team.objects.filter(id=self.team.id), build)
+        self.assertEqual((code, payload['name']), (status.HTTP_200_OK, "Cached"))
+        self.assertIsNone(response_cache.lookup(key))
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.id}/').data['name'], "Renamed")
+
+    def test_not_found_is_not_cached(self):
+        self.assertEqual(self.client.get('/api/matches/999/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/cache/stats/').status_code, status.HTTP_200_OK)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        response_cache.clear()
+        self.team = Team.objects.create(name="Polled")
+        self.other = Team.objects.create(name="Other")
+        self.match = Match.objects.create(inviting_team=self.team, guest_team=self.other)
+
+    def test_unchanged_team_returns_304_without_loading(self):
+        etag = self.client.get(f'/api/teams/{self.team.id}/')['ETag']
+        response_cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/teams/{self.team.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_roster_change_changes_etag(self):
+        etag = self.client.get(f'/api/teams/{self.team.id}/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create(name='Jane', surname='Doe', mail='jane.doe@example.com')
+            Player.objects.create(user=user, team=self.team)
+
+        response = self.client.get(f'/api/teams/{self.team.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['players']), 1)
+
+    def test_proposition_changes_match_etag(self):
+        etag = self.client.get(f'/api/matches/{self.match.id}/')['ETag']
+        self.assertEqual(self.client.get(f'/api/matches/{self.match.id}/', HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.match.update_proposition(self.team, 1, 0)
+        response = self.client.get(f'/api/matches/{self.match.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stale_instance_save_does_not_rewind_counters(self):
+        stale = Team.objects.get(id=self.team.id)
+        self.team.add_score(3, rating_delta=10.0)
+        stale.name = "Renamed"
+        stale.save()
+        team = Team.objects.get(id=self.team.id)
+        self.assertEqual((team.name, team.version, team.score, team.rating), ("Renamed", 3, 3, 1510.0))
+
+    def test_plain_save_refuses_changed_counters(self):
+        team = Team.objects.get(id=self.team.id)
+        team.score = 7
+        with self.assertRaises(ValueError):
+            team.save()
+        team.save(update_fields=['score'])
+        self.assertEqual(Team.objects.get(id=self.team.id).score, 7)
+
+        # Counters written by add_score or an explicit save are no longer "changed".
+        team.add_score(1)
+        team.name = "Renamed"
+        team.save()
+        created = Team.objects.create(name="New", score=2)
+        created.rating = 1600.0
+        with self.assertRaises(ValueError):
+            created.save()
+
+    def test_wildcard_if_none_match(self):
+        response = self.client.get(f'/api/teams/{self.team.id}/', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get('/api/teams/999/', HTTP_IF_NONE_MATCH='*').status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+
+class AsyncReadViewTests(TransactionTestCase):
+    # Pool threads use their own connections, so the data has to be committed.
+
+    def setUp(self):
+        response_cache.clear()
+        self.client = AsyncClient()
+        self.team = Team.objects.create(name="Async", score=5)
+        self.other = Team.objects.create(name="Other", is_public=False)
+        self.match = Match.objects.create(inviting_team=self.team, guest_team=self.other)
+
+    async def test_team_detail_and_etag(self):
+        response = await self.client.get(f'/api/async/teams/{self.team.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], "Async")
+
+        # Django 3.2's AsyncClient sends extra kwargs as raw header names.
+        response = await self.client.get(f'/api/async/teams/{self.team.id}/', **{'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_match_detail_not_found(self):
+        response = await self.client.get('/api/async/matches/999/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_team_list_and_leaderboard(self):
+        response = await self.client.get('/api/async/teams/?is_public=true')
+        self.assertEqual([t['name'] for t in response.json()['results']], ["Async"])
+
+        response = await self.client.get('/api/async/leaderboard/')
+        self.assertEqual(response.json()['results'][0]['name'], "Async")
+
+    async def test_limit_must_be_positive(self):
+        response = await self.client.get('/api/async/teams/?limit=0')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detail'], "limit must be at least 1.")
+
+        response = await self.client.get('/api/async/leaderboard/?limit=-1')
+        self.assertEqual(response.status_code, 400)
+
+    async def test_only_get_allowed(self):
+        response = await self.client.post('/api/async/teams/')
+        self.assertEqual(response.status_code, 405)
+
+
+@override_settings(LIVE_FEED_POLL_SECONDS=0)
+class LiveFeedTests(TransactionTestCase):
+    def setUp(self):
+        team_a = Team.objects.create(name="A")
+        team_b = Team.objects.create(name="B")
+        self.match = Match.objects.create(inviting_team=team_a, guest_team=team_b)
+        self.kickoff = MatchEvent.objects.create(match=self.match, event_type='Kickoff')
+
+    async def open_feed(self, path, headers=()):
+        inbox = asyncio.Queue()
+        sent = []
+        await inbox.put({'type': 'http.request', 'body': b'', 'more_body': False})
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': list(headers)}
+        app = live_feed_application(None)
+
+        async def send(message):
+            sent.append(message)
+
+        task = asyncio.ensure_future(app(scope, inbox.get, send))
+        return task, inbox, sent
+
+    async def wait_for(self, sent, text):
+        for _ in range(200):
+            if text in b''.join(m.get('body', b'') for m in sent):
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"{text!r} never streamed")
+
+    async def test_streams_backlog_and_new_events(self):
+        task, inbox, sent = await self.open_feed(f'/api/matches/{self.match.id}/live/')
+        await self.wait_for(sent, b'Kickoff')
+        self.assertEqual(sent[0]['status'], 200)
+
+        await sync_to_async(MatchEvent.objects.create, thread_sensitive=False)(match=self.match, event_type='Goal')
+        await self.wait_for(sent, b'"event_type": "Goal"')
+
+        await inbox.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(task, 1)
+
+    async def test_resumes_after_last_event_id(self):
+        goal = await sync_to_async(MatchEvent.objects.create, thread_sensitive=False)(match=self.match, event_type='Goal')
+        task, inbox, sent = await self.open_feed(
+            f'/api/matches/{self.match.id}/live/', headers=[(b'last-event-id', str(self.kickoff.id).encode())])
+        await self.wait_for(sent, f'id: {goal.id}'.encode())
+        self.assertNotIn(b'Kickoff', b''.join(m.get('body', b'') for m in sent))
+
+        await inbox.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(task, 1)
+
+    async def test_late_commit_with_lower_id_is_delivered(self):
+        create = sync_to_async(MatchEvent.objects.create, thread_sensitive=False)
+        early = await create(match=self.match, event_type='Goal')
+        late = await create(match=self.match, event_type='Card')
+        feed = MatchFeed(self.match.id, asyncio.get_running_loop())
+        subscriber = Subscriber(10)
+        feed.subscribers.add(subscriber)
+
+        # ``late`` reaches the feed first, as if ``early``'s transaction committed after it.
+        feed.deliver([event_payload(self.kickoff), event_payload(late)])
+        subscriber.drain()
+        poller = asyncio.ensure_future(_poll(feed))
+        try:
+            for _ in range(200):
+                if early.id in feed.buffered_ids:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            poller.cancel()
+
+        self.assertEqual([event_id for event_id, _ in subscriber.drain()], [early.id])
+        self.assertEqual([event_id for event_id, _ in feed.buffer], [self.kickoff.id, early.id, late.id])
+        feed.deliver([event_payload(early)])
+        self.assertEqual(subscriber.drain(), [])
+
+    def test_feed_on_closed_loop_does_not_fail_the_write(self):
+        loop = asyncio.new_event_loop()
+        feed = live_feeds.add(MatchFeed(self.match.id, loop))
+        loop.close()
+        try:
+            # Publishing runs on commit, which is immediate outside a transaction.
+            MatchEvent.objects.create(match=self.match, event_type='Goal')
+            self.assertEqual(live_feeds.for_match(self.match.id), [])
+        finally:
+            live_feeds.discard(feed)
+
+    async def test_unknown_match(self):
+        task, inbox, sent = await self.open_feed('/api/matches/999/live/')
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(sent[0]['status'], 404)
+
+
+class BulkMatchEventAPIViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        team_a = Team.objects.create(name="A")
+        team_b = Team.objects.create(name="B")
+        self.match = Match.objects.create(inviting_team=team_a, guest_team=team_b)
+
+    def test_events_saved_in_one_batch(self):
+        response = self.client.post('/api/matches/events/bulk/', {'events': [
+            {'match': self.match.id, 'event_type': 'Goal', 'description': '12\''},
+            {'match': 999, 'event_type': 'Goal'},
+            {'match': self.match.id},
+            {'match': self.match.id, 'event_type': 'Penalty'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'error', 'error', 'created'])
+        ids = [response.data['results'][i]['id'] for i in (0, 3)]
+        self.assertEqual(list(MatchEvent.objects.filter(id__in=ids).order_by('id').values_list('event_type', flat=True)),
+                         ['Goal', 'Penalty'])
+
+    @override_settings(EVENT_WRITE_BEHIND=True, EVENT_BUFFER_MAX_SIZE=3, EVENT_BUFFER_FLUSH_SECONDS=60)
+    def test_write_behind_flushes_on_size(self):
+        first = self.client.post('/api/matches/events/bulk/', {'events': [
+            {'match': self.match.id, 'event_type': 'Kickoff'},
+            {'match': self.match.id, 'event_type': 'Goal'},
+        ]}, format='json')
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(MatchEvent.objects.count(), 0)
+        self.assertEqual(len(event_buffer), 2)
+
+        second = self.client.post('/api/matches/events/bulk/', {'events': [
+            {'match': self.match.id, 'event_type': 'Goal'},
+        ]}, format='json')
+        sequences = [r['sequence'] for r in first.data['results'] + second.data['results']]
+        self.assertEqual(sequences, sorted(sequences))
+        self.assertEqual(len(event_buffer), 0)
+        self.assertEqual(list(MatchEvent.objects.order_by('id').values_list('event_type', flat=True)),
+                         ['Kickoff', 'Goal', 'Goal'])
+
+    @override_settings(EVENT_WRITE_BEHIND=True, EVENT_BUFFER_MAX_SIZE=100, EVENT_BUFFER_FLUSH_SECONDS=60)
+    def test_flush_writes_pending_events(self):
+        accepted_at = datetime(2026, 5, 1, 15, 30, tzinfo=timezone.utc)
+        with mock.patch('matchmaking.ingest.timezone.now', return_value=accepted_at):
+            self.client.post('/api/matches/events/bulk/', {'events': [
+                {'match': self.match.id, 'event_type': 'Goal'},
+            ]}, format='json')
+        self.assertEqual(event_buffer.flush(), 1)
+        self.assertEqual(MatchEvent.objects.get().timestamp, accepted_at)
+        self.assertEqual(event_buffer.flush(), 0)
+
+    @override_settings(EVENT_WRITE_BEHIND=True, EVENT_BUFFER_MAX_SIZE=1, EVENT_BUFFER_FLUSH_SECONDS=60)
+    def test_failed_flush_keeps_events_queued(self):
+        with mock.patch('matchmaking.ingest.save_events', side_effect=OperationalError("database is locked")):
+            response = self.client.post('/api/matches/events/bulk/', {'events': [
+                {'match': self.match.id, 'event_type': 'Goal'},
+            ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(event_buffer), 1)
+
+        self.assertEqual(event_buffer.flush(), 1)
+        self.assertEqual(MatchEvent.objects.count(), 1)
+
+    def test_payload_must_be_an_object(self):
+        response = self.client.post('/api/matches/events/bulk/', [{'match': self.match.id}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EndpointBenchmarkTests(TransactionTestCase):
+    # Includes the read replica when run with the production settings.
+    databases = '__all__'
+
+    def test_every_route_within_query_budget(self):
+        self.assertEqual(benchmarks.uncovered_routes(), [])
+
+        fixture = benchmarks.seed(teams=30, players=60, matches=90, events=60)
+        results = benchmarks.run(fixture, iterations=2, warmup=1)
+
+        self.assertEqual(benchmarks.over_budget(results), [])
+        self.assertEqual([r['route'] for r in results if max(r['statuses']) >= 500], [])
+
+
+class GenerateLeagueTests(TestCase):
+    def snapshot(self):
+        first_team = Team.objects.order_by('id').values_list('id', flat=True).first()
+        return [(m.inviting_team_id - first_team, m.guest_team_id - first_team, m.created_at, m.inviting_score, m.guest_score)
+                for m in Match.objects.order_by('id')]
+
+    def test_league_is_consistent(self):
+        created = generate(teams=6, players=50, matches=120, seed=7, batch_size=40)
+
+        self.assertEqual(created['matches'], 120)
+        self.assertEqual(Player.objects.count(), 50)
+        played = Match.objects.filter(status='COMPLETED').select_related('host_proposition', 'guest_proposition')
+        self.assertTrue(played.exists())
+        for match in played:
+            self.assertEqual((match.host_proposition.inviting_score, match.host_proposition.guest_score),
+                             (match.inviting_score, match.guest_score))
+            self.assertEqual(match.guest_proposition.suggesting_team_id, match.guest_team_id)
+            self.assertEqual(match.events.filter(event_type='Goal').count(), match.inviting_score + match.guest_score)
+        self.assertFalse(Match.objects.filter(inviting_team=F('guest_team')).exists())
+
+        for team in Team.objects.all():
+            self.assertEqual(team.score, sum(m.inviting_score for m in played if m.inviting_team_id == team.id) +
+                             sum(m.guest_score for m in played if m.guest_team_id == team.id))
+
+    def test_same_seed_same_league(self):
+        generate(teams=5, players=20, matches=60, seed=3, batch_size=25)
+        first = self.snapshot()
+        for model in (MatchEvent, Match, ScoreProposition, Player, User, Team):
+            model.objects.all().delete()
+
+        call_command('generate_league', teams=5, players=20, matches=60, seed=3, batch_size=25, stdout=StringIO())
+        self.assertEqual(self.snapshot(), first)
+
+    def test_dates_start_at_start_date(self):
+        generate(teams=3, players=5, matches=40, seed=1, days=30, start_date=date(2025, 3, 1))
+        dates = Match.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+        self.assertGreaterEqual(dates['first'], date(2025, 3, 1))
+        self.assertLessEqual(dates['last'], date(2025, 3, 30))
+
+
+class SqliteProductionModeTests(TransactionTestCase):
+    def test_reads_go_to_replica_outside_transactions(self):
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Team), 'replica')
+        self.assertEqual(router.db_for_read(User), 'replica')
+        self.assertEqual(router.db_for_write(Team), 'default')
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Team), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'matchmaking'))
+
+    def test_other_apps_stay_on_primary(self):
+        from django.contrib.auth.models import Group
+        self.assertEqual(ReadReplicaRouter().db_for_read(Group), 'default')
+
+    @override_settings(SQLITE_PRAGMAS={'default': {'cache_size': -4096, 'temp_store': 'MEMORY'}})
+    def test_pragmas_applied_to_new_connections(self):
+        connection.close()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size')
+                self.assertEqual(cursor.fetchone()[0], -4096)
+                cursor.execute('PRAGMA temp_store')
+                self.assertEqual(cursor.fetchone()[0], 2)
+        finally:
+            connection.close()
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        request_metrics.reset()
+        response_cache.clear()
+        self.team = Team.objects.create(name="Measured")
+
+    def test_metrics_endpoint(self):
+        self.client.get(f'/api/teams/{self.team.id}/')
+        self.client.get('/api/teams/999/')
+        self.client.get('/api/teams/')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('matchmaking_http_requests_total{route="team_detail",method="GET",status="200"} 1', body)
+        self.assertIn('matchmaking_http_requests_total{route="team_detail",method="GET",status="404"} 1', body)
+        self.assertIn('matchmaking_http_requests_total{route="team_list",method="GET",status="200"} 1', body)
+        self.assertIn('matchmaking_http_request_sql_queries_count{route="team_detail",method="GET"} 2', body)
+        self.assertIn('matchmaking_http_request_duration_seconds_bucket{route="team_list",method="GET",le="+Inf"} 1', body)
+        self.assertIn('matchmaking_response_cache_misses_total', body)
+
+    def test_unmatched_requests_are_grouped(self):
+        self.client.get('/no/such/page/')
+        self.assertIn('route="unmatched"', request_metrics.render())
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(f'/api/teams/{self.team.id}/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0, METRICS_SLOW_SQL_MS=0)
+    def test_slow_log(self):
+        with self.assertLogs('matchmaking.slow', level='WARNING') as logs:
+            self.client.get(f'/api/teams/{self.team.id}/')
+        self.assertTrue(any('Slow SQL' in line for line in logs.output))
+        self.assertTrue(any('Slow request GET' in line for line in logs.output))
+
+
+class TeamSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        team_search.prefix_cache.clear()
+        self.united = Team.objects.create(name="Hà Nội United", score=5)
+        self.city = Team.objects.create(name="Hanoi City", score=9)
+        self.rovers = Team.objects.create(name="Saigon Rovers")
+
+    def names(self, response):
+        return [team['name'] for team in response.data]
+
+    def test_search_ranks_and_ignores_diacritics(self):
+        response = self.client.get('/api/teams/search/', {'q': 'ha noi'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.names(response), ["Hà Nội United"])
+        self.assertEqual(set(response.data[0]), {'id', 'name', 'is_public', 'score', 'rating'})
+
+        response = self.client.get('/api/teams/search/', {'q': 'saigon'})
+        self.assertEqual(self.names(response), ["Saigon Rovers"])
+
+    def test_dropped_triggers_are_recreated(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            self.assertLessEqual(set(team_search.TRIGGERS), {name for name, in cursor.fetchall()})
+            # What a table rebuild in a later migration would leave behind.
+            cursor.execute("DROP TRIGGER matchmaking_team_search_update")
+        Team.objects.filter(pk=self.rovers.pk).update(name="Saigon Stars")
+
+        self.assertEqual(team_search.ensure_search_index(), ['matchmaking_team_search_update'])
+        self.assertEqual(team_search.ensure_search_index(), [])
+        response = self.client.get('/api/teams/search/', {'q': 'stars'})
+        self.assertEqual(self.names(response), ["Saigon Stars"])
+        self.assertEqual(self.client.get('/api/teams/search/', {'q': 'rovers'}).data, [])
+
+    def test_search_requires_a_word(self):
+        response = self.client.get('/api/teams/search/', {'q': ' !? '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_matches_prefixes(self):
+        response = self.client.get('/api/teams/autocomplete/', {'q': 'han'})
+        self.assertEqual(self.names(response), ["Hanoi City"])
+        response = self.client.get('/api/teams/autocomplete/', {'q': 'saigon rov'})
+        self.assertEqual(self.names(response), ["Saigon Rovers"])
+        self.assertEqual(self.client.get('/api/teams/autocomplete/', {'q': ''}).data, [])
+
+    def test_limit_must_be_positive(self):
+        for path in ('/api/teams/search/', '/api/teams/autocomplete/'):
+            for limit in (0, -1):
+                response = self.client.get(path, {'q': 'saigon', 'limit': limit})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_renames_and_deletes(self):
+        self.rovers.name = "Da Nang Rovers"
+        self.rovers.save()
+        self.assertEqual(team_search.search_teams('saigon'), [])
+        self.assertEqual([t['id'] for t in team_search.search_teams('nang')], [self.rovers.id])
+
+        self.rovers.delete()
+        self.assertEqual(team_search.search_teams('rovers'), [])
+
+    def test_autocomplete_cache_is_cleared_on_save(self):
+        self.assertEqual(self.names(self.client.get('/api/teams/autocomplete/', {'q': 'dra'})), [])
+        with self.assertNumQueries(0):
+            self.client.get('/api/teams/autocomplete/', {'q': 'dra'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Team.objects.create(name="Dragons")
+        self.assertEqual(self.names(self.client.get('/api/teams/autocomplete/', {'q': 'dra'})), ["Dragons"])
+
+
+class FreeAgentListAPIViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.team = Team.objects.create(name="Recruiters")
+        self.free = [Player.objects.create(user=User.objects.create(name=name, surname=surname, mail=f"{name}@example.com"))
+                     for name, surname in (("An", "Nguyen"), ("Binh", "Tran"), ("Chi", "Nguyen"))]
+        Player.objects.create(user=User.objects.create(name="Dung", surname="Nguyen", mail="dung@example.com"), team=self.team)
+
+    def test_lists_teamless_players_newest_first(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/players/free-agents/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data['results']], [p.id for p in reversed(self.free)])
+        self.assertEqual(response.data['results'][0]['username'], "Chi")
+        self.assertNotIn('email', response.data['results'][0])
+
+    def test_pagination(self):
+        response = self.client.get('/api/players/free-agents/', {'limit': 2})
+        self.assertEqual([p['id'] for p in response.data['results']], [self.free[2].id, self.free[1].id])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([p['id'] for p in response.data['results']], [self.free[0].id])
+        self.assertIsNone(response.data['next'])
+
+    def test_name_search(self):
+        response = self.client.get('/api/players/free-agents/', {'q': 'nguyen'})
+        self.assertEqual([p['username'] for p in response.data['results']], ["Chi", "An"])
+        response = self.client.get('/api/players/free-agents/', {'q': 'an nguy'})
+        self.assertEqual([p['username'] for p in response.data['results']], ["An"])
+
+    def test_joining_a_team_leaves_the_pool(self):
+        player = self.free[0]
+        player.team = self.team
+        player.save()
+        response = self.client.get('/api/players/free-agents/')
+        self.assertNotIn(player.id, [p['id'] for p in response.data['results']])
+
+
+class HeadToHeadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.a = Team.objects.create(name="A")
+        self.b = Team.objects.create(name="B")
+
+    def play(self, inviting, guest, inviting_score, guest_score, created_at=date(2024, 1, 1)):
+        match = Match.objects.create(inviting_team=inviting, guest_team=guest, created_at=created_at)
+        Match.propose_score(match.id, inviting.id, inviting_score, guest_score)
+        Match.propose_score(match.id, guest.id, guest_score, inviting_score)
+        return match
+
+    def record(self, team, opponent):
+        response = self.client.get(f'/api/teams/{team.id}/head-to-head/{opponent.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_record_from_both_sides(self):
+        self.play(self.a, self.b, 2, 0, date(2024, 1, 1))
+        last = self.play(self.b, self.a, 1, 1, date(2024, 3, 1))
+        self.play(self.b, self.a, 3, 1, date(2024, 2, 1))
+
+        with self.assertNumQueries(1):
+            record = self.record(self.a, self.b)
+        self.assertEqual({k: record[k] for k in ('matches', 'wins', 'draws', 'losses', 'goals_for', 'goals_against')},
+                         {'matches': 3, 'wins': 1, 'draws': 1, 'losses': 1, 'goals_for': 4, 'goals_against': 4})
+        self.assertEqual(record['last_match']['id'], last.id)
+
+        record = self.record(self.b, self.a)
+        self.assertEqual((record['wins'], record['losses'], record['goals_for']), (1, 1, 4))
+
+    def test_corrected_score_replaces_old_result(self):
+        match = self.play(self.a, self.b, 2, 0)
+        Match.propose_score(match.id, self.a.id, 0, 1)
+        Match.propose_score(match.id, self.b.id, 1, 0)
+        record = self.record(self.a, self.b)
+        self.assertEqual((record['matches'], record['wins'], record['losses'], record['goals_for']), (1, 0, 1, 0))
+
+    def test_unplayed_pair_and_unknown_team(self):
+        record = self.record(self.a, self.b)
+        self.assertEqual((record['matches'], record['last_match']), (0, None))
+        self.assertEqual(self.client.get(f'/api/teams/{self.a.id}/head-to-head/999/').status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f'/api/teams/{self.a.id}/head-to-head/{self.a.id}/').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_matches_incremental_updates(self):
+        c = Team.objects.create(name="C")
+        for inviting, guest, scores, day in ((self.a, self.b, (2, 1), 1), (c, self.a, (0, 0), 2),
+                                             (self.b, self.a, (4, 1), 3), (self.b, c, (1, 2), 3), (c, self.b, (1, 2), 3)):
+            self.play(inviting, guest, *scores, date(2024, 1, day))
+        # Proposed but not agreed: not part of any record.
+        Match.propose_score(Match.objects.create(inviting_team=self.a, guest_team=c).id, self.a.id, 5, 0)
+        fields = [field.attname for field in HeadToHead._meta.concrete_fields if field.name != 'id']
+        incremental = list(HeadToHead.objects.order_by('team_low', 'team_high').values(*fields))
+
+        out = StringIO()
+        call_command('rebuild_head_to_head', stdout=out)
+        self.assertIn("Rebuilt 3 head-to-head records from 5 matches", out.getvalue())
+        self.assertEqual(list(HeadToHead.objects.order_by('team_low', 'team_high').values(*fields)), incremental)
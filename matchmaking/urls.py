@@ -1,17 +1,40 @@
 from django.urls import path
-from .views import AcceptPlayerInviteAPIView, AcceptTeamRequestAPIView, CreateMatchAPIView, CreatePlayerAPIView, CreateTeamAPIView, InvitePlayerAPIView, MatchDetailAPIView, MatchScorePropositionAPIView, RequestJoinTeamAPIView, TeamChallengeAPIView, TeamDetailView, TeamListView
+
+from . import async_views
+from .views import AcceptPlayerInviteAPIView, AcceptTeamRequestAPIView, BulkCreateMatchAPIView, BulkMatchEventAPIView, CacheStatsAPIView, CreateMatchAPIView, CreatePlayerAPIView, CreateTeamAPIView, ExportAPIView, FreeAgentListAPIView, ImportPlayersAPIView, InvitePlayerAPIView, LeaderboardAPIView, MatchDetailAPIView, MetricsAPIView, MatchScorePropositionAPIView, NearbyTeamsAPIView, RequestJoinTeamAPIView, TeamChallengeAPIView, TeamDetailView, TeamHeadToHeadAPIView, TeamListView, TeamMatchHistoryAPIView, TeamNearestOpponentsAPIView, TeamOpponentsAPIView, TeamQueueAPIView, TeamAutocompleteAPIView, TeamRankAPIView, TeamSearchAPIView
 
 urlpatterns = [
     path('api/teams/<int:id>/', TeamDetailView.as_view(), name='team_detail'),
-    path('api/teams/', TeamListView.as_view(), name='team_detail'),
+    path('api/teams/', TeamListView.as_view(), name='team_list'),
     path('api/teams/<int:id>/challenge/', TeamChallengeAPIView.as_view(), name='team_challenge'),
+    path('api/teams/<int:id>/opponents/', TeamOpponentsAPIView.as_view(), name='team_opponents'),
+    path('api/teams/<int:id>/queue/', TeamQueueAPIView.as_view(), name='team_queue'),
+    path('api/teams/<int:id>/matches/', TeamMatchHistoryAPIView.as_view(), name='team_match_history'),
+    path('api/teams/<int:id>/head-to-head/<int:opponent_id>/', TeamHeadToHeadAPIView.as_view(), name='team_head_to_head'),
+    path('api/teams/<int:id>/nearest/', TeamNearestOpponentsAPIView.as_view(), name='team_nearest_opponents'),
+    path('api/teams/nearby/', NearbyTeamsAPIView.as_view(), name='teams_nearby'),
+    path('api/teams/search/', TeamSearchAPIView.as_view(), name='team_search'),
+    path('api/teams/autocomplete/', TeamAutocompleteAPIView.as_view(), name='team_autocomplete'),
     path('api/matches/<int:id>/', MatchDetailAPIView.as_view(), name='match_detail'),
-    path('api/matches/<int:id>/score-proposition/', MatchScorePropositionAPIView.as_view(), name='match_score_proposition'),
+    path('api/matches/<int:match_id>/score-proposition/', MatchScorePropositionAPIView.as_view(), name='match_score_proposition'),
     path('api/create_player/', CreatePlayerAPIView.as_view(), name='create_player'),
+    path('api/players/free-agents/', FreeAgentListAPIView.as_view(), name='free_agents'),
+    path('api/players/import/', ImportPlayersAPIView.as_view(), name='import_players'),
     path('api/create_team/', CreateTeamAPIView.as_view(), name='create_team'),
     path('api/teams/<int:team_id>/invite_player/', InvitePlayerAPIView.as_view(), name='team_invite_player'),
     path('api/teams/<int:team_id>/request_join/', RequestJoinTeamAPIView.as_view(), name='team_request_join'),
     path('api/player_invitations/<int:invite_id>/accept/', AcceptPlayerInviteAPIView.as_view(), name='accept_player_invite'),
     path('api/team_requests/<int:request_id>/accept/', AcceptTeamRequestAPIView.as_view(), name='accept_team_request'),
     path('api/matches/create/', CreateMatchAPIView.as_view(), name='create_match'),
+    path('api/matches/bulk/', BulkCreateMatchAPIView.as_view(), name='bulk_create_match'),
+    path('api/matches/events/bulk/', BulkMatchEventAPIView.as_view(), name='bulk_match_events'),
+    path('api/leaderboard/', LeaderboardAPIView.as_view(), name='leaderboard'),
+    path('api/teams/<int:id>/rank/', TeamRankAPIView.as_view(), name='team_rank'),
+    path('api/export/<slug:dataset>.<slug:fmt>', ExportAPIView.as_view(), name='export'),
+    path('api/cache/stats/', CacheStatsAPIView.as_view(), name='cache_stats'),
+    path('metrics', MetricsAPIView.as_view(), name='metrics'),
+    path('api/async/teams/', async_views.team_list, name='async_team_list'),
+    path('api/async/teams/<int:id>/', async_views.team_detail, name='async_team_detail'),
+    path('api/async/matches/<int:id>/', async_views.match_detail, name='async_match_detail'),
+    path('api/async/leaderboard/', async_views.leaderboard_top, name='async_leaderboard'),
 ]
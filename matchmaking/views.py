@@ -1,29 +1,147 @@
 # matchmaking/views.py
-from django.http import Http404
+import codecs
+import csv
+import math
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import Team, Match, Player, PlayerInvite, TeamRequest, User
-from .serializers import TeamSerializer, MatchSerializer, ScorePropositionSerializer, PlayerSerializer, TeamRequestSerializer, PlayerInviteSerializer
+from .bulk import bulk_create_with_ids
+from . import cache, exporters, headtohead, ingest, search
+from .metrics import metrics
+from .geo import nearest_teams, teams_within
+from .importers import import_players, iter_rows
+from .leaderboard import leaderboard
+from .models import Team, Match, MatchEvent, Player, PlayerInvite, QueueTicket, TeamRequest, User
+from .params import bounded_int
+from .pagination import DateKeysetPagination, FreeAgentCursorPagination, TeamCursorPagination
+from .serializers import BulkMatchItemSerializer, FreeAgentSerializer, MatchEventItemSerializer, TeamSerializer, MatchSerializer, OpponentSerializer, QueueTicketSerializer, ScorePropositionSerializer, PlayerSerializer, TeamRequestSerializer, PlayerInviteSerializer
+
+def _etag(version):
+    return f'"{version}"'
+
+
+def request_etags(request):
+    return {tag.strip().replace('W/', '', 1) for tag in request.headers.get('If-None-Match', '').split(',')}
+
+
+def _not_modified(if_none_match, etag):
+    # "*" matches any current representation of an existing object.
+    return etag in if_none_match or '*' in if_none_match
+
+
+def _detail_state(if_none_match, key, versions, build):
+    """Resolve a cached, ETag-versioned detail payload to ``(status, payload, etag)``.
+
+    On a cache miss only ``version`` is read first, so an unchanged object
+    is answered with 304 without being loaded or serialized. A freshly built
+    payload is checked against ``version`` again once stored: a write that
+    committed meanwhile may already have run its invalidation, and would
+    otherwise leave the old payload cached.
+    """
+    payload = cache.lookup(key)
+    if payload is None:
+        version = versions.values_list('version', flat=True).first()
+        if version is None:
+            return status.HTTP_404_NOT_FOUND, None, None
+        if _not_modified(if_none_match, _etag(version)):
+            return status.HTTP_304_NOT_MODIFIED, None, _etag(version)
+        payload = build()
+        if payload is None:
+            return status.HTTP_404_NOT_FOUND, None, None
+        cache.store(key, payload)
+        if versions.values_list('version', flat=True).first() != payload['version']:
+            cache.discard(key)
+
+    etag = _etag(payload['version'])
+    if _not_modified(if_none_match, etag):
+        return status.HTTP_304_NOT_MODIFIED, None, etag
+    return status.HTTP_200_OK, payload, etag
+
+
+def team_detail_state(if_none_match, id):
+    def build():
+        team = Team.objects.with_players().filter(id=id).first()
+        return TeamSerializer(team).data if team else None
+
+    return _detail_state(if_none_match, cache.team_key(id), Team.objects.filter(id=id), build)
+
+
+def match_detail_state(if_none_match, id):
+    def build():
+        match = Match.objects.filter(id=id).first()
+        return MatchSerializer(match).data if match else None
+
+    return _detail_state(if_none_match, cache.match_key(id), Match.objects.filter(id=id), build)
+
+
+def filter_teams(teams, params):
+    """Apply the ``is_public``/``min_score``/``max_score`` filters; raises ValueError."""
+    is_public = params.get('is_public')
+    if is_public is not None:
+        if is_public.lower() not in ('true', 'false', '1', '0'):
+            raise ValueError("is_public must be true or false.")
+        teams = teams.filter(is_public=is_public.lower() in ('true', '1'))
+
+    for param, lookup in (('min_score', 'score__gte'), ('max_score', 'score__lte')):
+        value = params.get(param)
+        if value is not None:
+            try:
+                teams = teams.filter(**{lookup: int(value)})
+            except ValueError:
+                raise ValueError(f"{param} must be an integer.") from None
+    return teams
+
 
 # Chi tiết đội bóng
 class TeamDetailView(APIView):
     def get(self, request, id):
-        try:
-            team = Team.objects.get(id=id)
-            serializer = TeamSerializer(team)
-            return Response(serializer.data)
-        except Team.DoesNotExist:
-            return Response({"detail": "Team not found."}, status=status.HTTP_404_NOT_FOUND)
+        code, payload, etag = team_detail_state(request_etags(request), id)
+        if code == status.HTTP_404_NOT_FOUND:
+            return Response({"detail": "Team not found."}, status=code)
+        return Response(payload, status=code, headers={'ETag': etag})
 
+# Danh sách đội bóng (phân trang theo cursor)
 class TeamListView(APIView):
     def get(self, request):
         try:
-            team = Team.objects.all()
-            serializer = TeamSerializer(team, many=True)
-            return Response(serializer.data)
-        except Team.DoesNotExist:
-            return Response({"detail": "Team not found."}, status=status.HTTP_404_NOT_FOUND)
+            teams = filter_teams(Team.objects.with_players(), request.query_params)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = TeamCursorPagination()
+        page = paginator.paginate_queryset(teams, request, view=self)
+        serializer = TeamSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+# Tìm kiếm đội bóng theo tên
+class TeamSearchAPIView(APIView):
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        if not search.terms(query):
+            return Response({"detail": "q must contain at least one word."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = bounded_int(request.query_params, 'limit', 20, 100)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(search.search_teams(query, limit))
+
+# Gợi ý tên đội bóng khi đang gõ
+class TeamAutocompleteAPIView(APIView):
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        if not search.terms(query):
+            return Response([])
+        try:
+            limit = bounded_int(request.query_params, 'limit', 10, 20)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(search.autocomplete(query, limit))
 
 # Thách đấu đội khác
 class TeamChallengeAPIView(APIView):
@@ -46,32 +164,123 @@ class TeamChallengeAPIView(APIView):
             return Response({"detail": "Team not found."}, status=status.HTTP_404_NOT_FOUND)
         
 
-# Chi tiết trận đấu
-class MatchDetailAPIView(APIView):
+# Gợi ý đối thủ
+class TeamOpponentsAPIView(APIView):
     def get(self, request, id):
+        by = request.query_params.get('by', 'rating')
+        if by not in ('rating', 'score'):
+            return Response({"detail": "by must be rating or score."}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            match = Match.objects.get(id=id)
-            serializer = MatchSerializer(match)
-            return Response(serializer.data)
-        except Match.DoesNotExist:
-            return Response({"detail": "Match not found."}, status=status.HTTP_404_NOT_FOUND)
-        
+            k = bounded_int(request.query_params, 'k', 5, 50)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            team = Team.objects.get(id=id)
+        except Team.DoesNotExist:
+            return Response({"detail": "Team not found."}, status=status.HTTP_404_NOT_FOUND)
 
-# Đề xuất điểm số trận đấu
-class MatchScorePropositionAPIView(APIView):
-    def post(self, request, match_id):
+        serializer = OpponentSerializer(team.suggest_opponents(k=k, by=by), many=True)
+        return Response(serializer.data)
+
+
+def _with_distances(results):
+    data = []
+    for team, distance in results:
+        item = OpponentSerializer(team).data
+        item['distance_km'] = round(distance, 3)
+        data.append(item)
+    return data
+
+
+# Đội bóng gần vị trí
+class NearbyTeamsAPIView(APIView):
+    def get(self, request):
         try:
-            match = Match.objects.get(id=match_id)
-            my_team_id = request.data.get('my_team_id')
-            my_score = request.data.get('my_score')
-            opponent_score = request.data.get('opponent_score')
+            latitude = float(request.query_params['lat'])
+            longitude = float(request.query_params['lon'])
+            km = float(request.query_params.get('km', 10))
+        except (KeyError, ValueError):
+            return Response({"detail": "lat and lon are required numbers."}, status=status.HTTP_400_BAD_REQUEST)
+        # Written so that NaN fails every check.
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return Response({"detail": "lat must be within [-90, 90] and lon within [-180, 180]."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (0 < km < math.inf):
+            return Response({"detail": "km must be a positive number."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(_with_distances(teams_within(latitude, longitude, min(km, 500))))
 
-            my_team = match.inviting_team if my_team_id == match.inviting_team.id else match.guest_team
 
-            match.update_proposition(my_team, my_score, opponent_score)
-            return Response({"detail": "Score proposition updated successfully."}, status=status.HTTP_200_OK)
-        except Match.DoesNotExist:
-            return Response({"detail": "Match not found."}, status=status.HTTP_404_NOT_FOUND)
+# Đối thủ gần nhất
+class TeamNearestOpponentsAPIView(APIView):
+    def get(self, request, id):
+        try:
+            k = bounded_int(request.query_params, 'k', 5, 50)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            team = Team.objects.get(id=id)
+        except Team.DoesNotExist:
+            return Response({"detail": "Team not found."}, status=status.HTTP_404_NOT_FOUND)
+        if team.latitude is None or team.longitude is None:
+            return Response({"detail": "Team has no home location."}, status=status.HTTP_400_BAD_REQUEST)
+
+        candidates = Team.objects.filter(is_public=True).exclude(id=team.id)
+        results, km = nearest_teams(team.latitude, team.longitude, k, candidates)
+        return Response({"searched_km": km, "results": _with_distances(results)})
+
+
+# Lịch sử trận đấu của đội
+class TeamMatchHistoryAPIView(APIView):
+    def get(self, request, id):
+        try:
+            team = Team.objects.only('id').get(id=id)
+        except Team.DoesNotExist:
+            return Response({"detail": "Team not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        params = request.query_params
+        filters = []
+        state = params.get('state')
+        if state == 'played':
+            filters.append(Q(inviting_score__isnull=False, guest_score__isnull=False))
+        elif state == 'planned':
+            filters.append(Q(inviting_score__isnull=True, guest_score__isnull=True))
+        elif state is not None:
+            return Response({"detail": "state must be played or planned."}, status=status.HTTP_400_BAD_REQUEST)
+        if params.get('status'):
+            filters.append(Q(status=params['status']))
+        for param, lookup in (('date_from', 'created_at__gte'), ('date_to', 'created_at__lte')):
+            if params.get(param):
+                value = parse_date(params[param])
+                if value is None:
+                    return Response({"detail": f"{param} must be a YYYY-MM-DD date."}, status=status.HTTP_400_BAD_REQUEST)
+                filters.append(Q(**{lookup: value}))
+
+        paginator = DateKeysetPagination(request)
+        try:
+            limit = paginator.get_limit()
+            position = paginator.get_position()
+        except ValueError:
+            return Response({"detail": "Invalid limit or cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        if position is not None:
+            created_at, pk = position
+            filters.append(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        matches = list(team.match_history(*filters).order_by('-created_at', '-id')[:limit + 1])
+        next_link = paginator.get_next_link(matches[limit - 1]) if len(matches) > limit else None
+        return Response({
+            "next": next_link,
+            "results": MatchSerializer(matches[:limit], many=True).data,
+        })
+
+
+# Chi tiết trận đấu
+class MatchDetailAPIView(APIView):
+    def get(self, request, id):
+        code, payload, etag = match_detail_state(request_etags(request), id)
+        if code == status.HTTP_404_NOT_FOUND:
+            return Response({"detail": "Match not found."}, status=code)
+        return Response(payload, status=code, headers={'ETag': etag})
+        
 
 # Tạo người chơi mới
 class CreatePlayerAPIView(APIView):
@@ -86,17 +295,48 @@ class CreatePlayerAPIView(APIView):
         serializer = PlayerSerializer(player)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+# Nhập hàng loạt người chơi
+class ImportPlayersAPIView(APIView):
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "Upload a CSV or JSONL file as 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.data.get('format') or ('jsonl' if upload.name.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if fmt not in ('csv', 'jsonl'):
+            return Response({"detail": "format must be csv or jsonl."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = import_players(iter_rows(codecs.iterdecode(upload, 'utf-8'), fmt))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            return Response({"detail": f"Could not parse file: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED)
+
 # Tạo đội bóng mới
 class CreateTeamAPIView(APIView):
     def post(self, request):
         team_data = request.data
         team = Team.objects.create(
             name=team_data['name'],
-            is_public=team_data['is_public']
+            is_public=team_data['is_public'],
+            latitude=team_data.get('latitude'),
+            longitude=team_data.get('longitude')
         )
         serializer = TeamSerializer(team)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+# Danh sách cầu thủ tự do (chưa có đội), mới nhất trước
+class FreeAgentListAPIView(APIView):
+    def get(self, request):
+        players = Player.objects.free_agents()
+        # Every word of ``q`` must appear in the first name or the surname.
+        for word in request.query_params.get('q', '').split():
+            players = players.filter(Q(user__name__icontains=word) | Q(user__surname__icontains=word))
+
+        paginator = FreeAgentCursorPagination()
+        page = paginator.paginate_queryset(players, request, view=self)
+        serializer = FreeAgentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
 # Mời người chơi tham gia đội
 class InvitePlayerAPIView(APIView):
     def post(self, request, team_id):
@@ -188,8 +428,8 @@ class CreateMatchAPIView(APIView):
         guest_team = match_data['guest_team']
 
         match = Match.objects.create(
-            inviting_team=inviting_team,
-            guest_team=guest_team,
+            inviting_team_id=inviting_team,
+            guest_team_id=guest_team,
             status='PENDING',
             created_at=match_data['created_at'],
             expires_at=match_data['expires_at']
@@ -197,16 +437,230 @@ class CreateMatchAPIView(APIView):
         serializer = MatchSerializer(match)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+
+def validate_bulk_items(data, key, serializer_class, max_items):
+    """Validate the items of the list ``data[key]`` one by one.
+
+    Returns ``(items, results, valid)``: ``results`` holds an error entry for
+    every invalid item and None for the others, ``valid`` pairs the index of
+    every valid item with its validated data. Raises ValueError if there is
+    no such non-empty list of at most ``max_items`` items.
+    """
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError(f"{key} must be a non-empty list.")
+    if len(items) > max_items:
+        raise ValueError(f"At most {max_items} {key} per request.")
+
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        serializer = serializer_class(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {"index": index, "status": "error", "errors": serializer.errors}
+    return items, results, valid
+
+
+# Tạo nhiều trận đấu cùng lúc
+class BulkCreateMatchAPIView(APIView):
+    max_items = 1000
+
+    def post(self, request):
+        try:
+            items, results, valid = validate_bulk_items(request.data, 'matches', BulkMatchItemSerializer, self.max_items)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        team_ids = {data[side] for _, data in valid for side in ('inviting_team', 'guest_team')}
+        teams = Team.objects.only('id').in_bulk(team_ids)
+
+        to_create = []
+        for index, data in valid:
+            missing = [data[side] for side in ('inviting_team', 'guest_team') if data[side] not in teams]
+            if missing:
+                results[index] = {"index": index, "status": "error", "errors": {"detail": f"Team not found: {missing}."}}
+                continue
+            match = Match(
+                inviting_team_id=data['inviting_team'],
+                guest_team_id=data['guest_team'],
+                status='PENDING',
+                expires_at=data.get('expires_at')
+            )
+            if data.get('created_at'):
+                match.created_at = data['created_at']
+            to_create.append((index, match))
+
+        bulk_create_with_ids(Match, [match for _, match in to_create], batch_size=500)
+
+        for index, match in to_create:
+            results[index] = {"index": index, "status": "created", "id": match.pk}
+
+        created = len(to_create)
+        return Response({
+            "created": created,
+            "failed": len(items) - created,
+            "results": results,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+# Ghi nhiều sự kiện trận đấu cùng lúc
+class BulkMatchEventAPIView(APIView):
+    max_items = 1000
+
+    def post(self, request):
+        try:
+            items, results, valid = validate_bulk_items(request.data, 'events', MatchEventItemSerializer, self.max_items)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = Match.objects.only('id').in_bulk({data['match'] for _, data in valid})
+        accepted = []
+        for index, data in valid:
+            if data['match'] not in matches:
+                results[index] = {"index": index, "status": "error", "errors": {"detail": f"Match not found: {data['match']}."}}
+                continue
+            event = MatchEvent(match_id=data['match'], event_type=data['event_type'], description=data.get('description'))
+            accepted.append((index, event))
+
+        events = [event for _, event in accepted]
+        if getattr(settings, 'EVENT_WRITE_BEHIND', False):
+            sequences = ingest.event_buffer.add(events)
+            for (index, _), sequence in zip(accepted, sequences):
+                results[index] = {"index": index, "status": "queued", "sequence": sequence}
+            created_status = status.HTTP_202_ACCEPTED
+        else:
+            ingest.save_events(events)
+            for index, event in accepted:
+                results[index] = {"index": index, "status": "created", "id": event.pk}
+            created_status = status.HTTP_201_CREATED
+
+        return Response({
+            "accepted": len(accepted),
+            "failed": len(items) - len(accepted),
+            "results": results,
+        }, status=created_status if accepted else status.HTTP_400_BAD_REQUEST)
+
+# Đề xuất điểm số trận đấu
 class MatchScorePropositionAPIView(APIView):
     def post(self, request, match_id):
         try:
-            match = Match.objects.get(id=match_id)
-            my_team_id = request.data.get('my_team_id')
-            my_score = request.data.get('my_score')
-            opponent_score = request.data.get('opponent_score')
+            my_team_id = int(request.data.get('my_team_id'))
+            my_score = int(request.data.get('my_score'))
+            opponent_score = int(request.data.get('opponent_score'))
+        except (TypeError, ValueError):
+            return Response({"detail": "my_team_id, my_score and opponent_score must be integers."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-            my_team = match.inviting_team if my_team_id == match.inviting_team.id else match.guest_team
-            match.update_proposition(my_team, my_score, opponent_score)
-            return Response({"detail": "Score proposition updated successfully."}, status=status.HTTP_200_OK)
+        try:
+            Match.propose_score(match_id, my_team_id, my_score, opponent_score)
         except Match.DoesNotExist:
-            return Response({"detail": "Match not found."}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response({"detail": "Match not found."}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"detail": "Score proposition updated successfully."}, status=status.HTTP_200_OK)
+
+# Bảng xếp hạng
+class LeaderboardAPIView(APIView):
+    def get(self, request):
+        try:
+            limit = bounded_int(request.query_params, 'limit', 10, 100)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "total": leaderboard.count(),
+            "results": leaderboard.top(limit),
+        })
+
+
+# Thứ hạng của đội bóng
+class TeamRankAPIView(APIView):
+    def get(self, request, id):
+        try:
+            radius = bounded_int(request.query_params, 'radius', 2, 50, minimum=0)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        around = leaderboard.around(id, radius)
+        if around is None:
+            return Response({"detail": "Team not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            "id": id,
+            "rank": next(entry['rank'] for entry in around if entry['id'] == id),
+            "total": leaderboard.count(),
+            "around": around,
+        })
+
+
+# Thành tích đối đầu giữa hai đội
+class TeamHeadToHeadAPIView(APIView):
+    def get(self, request, id, opponent_id):
+        if id == opponent_id:
+            return Response({"detail": "A team has no head-to-head record against itself."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        record = headtohead.between(id, opponent_id)
+        if record is None:
+            return Response({"detail": "Team not found."}, status=status.HTTP_404_NOT_FOUND)
+        last_match = record['last_match']
+        record['last_match'] = MatchSerializer(last_match).data if last_match else None
+        return Response(record)
+
+
+# Hàng chờ ghép trận
+class TeamQueueAPIView(APIView):
+    def get(self, request, id):
+        ticket = QueueTicket.objects.filter(team_id=id).order_by('-created_at', '-id').first()
+        if ticket is None:
+            return Response({"detail": "Team is not queued."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(QueueTicketSerializer(ticket).data)
+
+    def post(self, request, id):
+        try:
+            team = Team.objects.get(id=id)
+        except Team.DoesNotExist:
+            return Response({"detail": "Team not found."}, status=status.HTTP_404_NOT_FOUND)
+        if QueueTicket.objects.filter(team=team, status='WAITING').exists():
+            return Response({"detail": "Team is already queued."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                ticket = QueueTicket.objects.create(team=team)
+        except IntegrityError:
+            # Lost the race against a concurrent request for the same team.
+            return Response({"detail": "Team is already queued."}, status=status.HTTP_409_CONFLICT)
+        return Response(QueueTicketSerializer(ticket).data, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, id):
+        cancelled = QueueTicket.objects.filter(team_id=id, status='WAITING').update(status='CANCELLED')
+        if not cancelled:
+            return Response({"detail": "Team is not queued."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"detail": "Team left the queue."}, status=status.HTTP_200_OK)
+
+
+# Xuất dữ liệu (NDJSON/CSV)
+class ExportAPIView(APIView):
+    def get(self, request, dataset, fmt):
+        if dataset not in exporters.DATASETS or fmt not in exporters.FORMATS:
+            return Response({"detail": "Unknown dataset or format."}, status=status.HTTP_404_NOT_FOUND)
+        since = request.query_params.get('since')
+        try:
+            since = exporters.parse_since(since) if since else None
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        records = exporters.iter_records(dataset, since)
+        response = StreamingHttpResponse(exporters.render(dataset, fmt, records), content_type=exporters.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{fmt}"'
+        return response
+
+
+# Thống kê bộ nhớ đệm
+class CacheStatsAPIView(APIView):
+    def get(self, request):
+        return Response(cache.stats.snapshot())
+
+
+# Số liệu hiệu năng (định dạng Prometheus)
+class MetricsAPIView(APIView):
+    def get(self, request):
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')